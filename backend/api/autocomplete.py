@@ -0,0 +1,60 @@
+import threading
+from bisect import bisect_left
+
+from foodgram.db_routers import use_primary
+from recipes.models import Ingredient
+from recipes.versions import INGREDIENTS, get_version
+
+PREFIX_END = '\U0010ffff'
+
+
+class IngredientIndex:
+    """In-memory prefix index of ingredients for autocomplete.
+
+    Ingredients are kept in a list sorted by casefolded name, so a prefix
+    lookup is two bisections and a slice. Results come out ranked: exact
+    matches first, then the remaining prefix matches alphabetically.
+    The index is built on first use and rebuilt whenever the ingredients
+    version changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = None
+
+    @staticmethod
+    def _build(version):
+        with use_primary():
+            rows = list(Ingredient.objects.values(
+                'id', 'name', 'measurement_unit'))
+        ingredients = sorted(
+            rows,
+            key=lambda row: (row['name'].casefold(), row['name'], row['id'])
+        )
+        keys = [row['name'].casefold() for row in ingredients]
+        return version, keys, ingredients
+
+    def _get_state(self):
+        version = get_version(INGREDIENTS)
+        state = self._state
+        if state is not None and state[0] == version:
+            return state
+        with self._lock:
+            if self._state is None or self._state[0] != version:
+                self._state = self._build(version)
+            return self._state
+
+    def search(self, prefix='', limit=None):
+        """Return up to limit ingredients whose name starts with prefix."""
+        _, keys, ingredients = self._get_state()
+        if not prefix:
+            return ingredients[:limit]
+        prefix = prefix.casefold()
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + PREFIX_END, lo=start)
+        if limit is not None:
+            end = min(end, start + limit)
+        return ingredients[start:end]
+
+
+ingredient_index = IngredientIndex()
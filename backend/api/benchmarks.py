@@ -0,0 +1,120 @@
+import math
+import time
+from urllib.parse import quote
+
+from django.db import connection
+from django.db.models import Count
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+IMAGE = ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAgMAAABie'
+         'ywaAAAACVBMVEUAAAD///9fX1/S0ecCAAAACXBIWXMAAA7EAAAOxAGVKw4bAAAACkl'
+         'EQVQImWNoAAAAggCByxOyYQAAAABJRU5ErkJggg==')
+
+
+def recipe_payload(samples, name):
+    return {
+        'name': name,
+        'text': 'Описание рецепта для замера производительности.',
+        'cooking_time': 30,
+        'tags': [samples['tag_id']],
+        'ingredients': [{'id': samples['ingredient'], 'amount': 100}],
+    }
+
+
+def create_payload(samples, iteration):
+    return dict(recipe_payload(samples, f'Замер {iteration}'), image=IMAGE)
+
+
+def patch_payload(samples, iteration):
+    return recipe_payload(samples, f'Замер, изменение {iteration}')
+
+
+# (name, method, url, payload factory or None). The list is run round-robin,
+# so every add is followed by the matching remove.
+ENDPOINTS = (
+    ('tags-list', 'get', '/api/tags/', None),
+    ('ingredients-search', 'get', '/api/ingredients/?name={prefix}', None),
+    ('recipes-list', 'get', '/api/recipes/', None),
+    ('recipes-list-tags', 'get', '/api/recipes/?tags={tag}', None),
+    ('recipes-list-author', 'get', '/api/recipes/?author={author}', None),
+    ('recipes-list-favorited', 'get', '/api/recipes/?is_favorited=1', None),
+    ('recipes-list-keyset', 'get', '/api/recipes/?cursor=&limit=6', None),
+    ('recipes-search', 'get', '/api/recipes/?search={word}', None),
+    ('recipes-detail', 'get', '/api/recipes/{recipe}/', None),
+    ('recipes-create', 'post', '/api/recipes/', create_payload),
+    ('recipes-patch', 'patch', '/api/recipes/{own_recipe}/', patch_payload),
+    ('favorite-add', 'post', '/api/recipes/{recipe}/favorite/', None),
+    ('favorite-remove', 'delete', '/api/recipes/{recipe}/favorite/', None),
+    ('cart-add', 'post', '/api/recipes/{recipe}/shopping_cart/', None),
+    ('cart-remove', 'delete', '/api/recipes/{recipe}/shopping_cart/', None),
+    ('cart-download', 'get', '/api/recipes/download_shopping_cart/', None),
+    ('users-list', 'get', '/api/users/', None),
+    ('users-me', 'get', '/api/users/me/', None),
+    ('users-detail', 'get', '/api/users/{author}/', None),
+    ('subscriptions', 'get', '/api/users/subscriptions/?recipes_limit=3',
+     None),
+    ('subscribe', 'post', '/api/users/{author}/subscribe/?recipes_limit=3',
+     None),
+    ('unsubscribe', 'delete', '/api/users/{author}/subscribe/', None),
+)
+
+
+def get_samples():
+    """The user with the largest cart, plus the most active author the user
+    is not subscribed to and a recipe outside the user's favorites and
+    cart, so that every filter returns rows and every add succeeds.
+
+    Returns (user, samples) or (None, None) when the database is empty.
+    """
+    user = User.objects.annotate(
+        cart_size=Count('user_cart')).order_by('-cart_size').first()
+    if user is None:
+        return None, None
+    author = User.objects.exclude(pk=user.pk).exclude(
+        subscribers=user).order_by('-recipes_count').first()
+    recipe = Recipe.objects.exclude(favorite=user).exclude(cart=user).first()
+    tag = Tag.objects.first()
+    ingredient = Ingredient.objects.first()
+    if None in (author, recipe, tag, ingredient):
+        return None, None
+    return user, {
+        'author': author.pk,
+        'recipe': recipe.pk,
+        'own_recipe': None,
+        'tag': tag.slug,
+        'tag_id': tag.pk,
+        'ingredient': ingredient.pk,
+        'word': quote(recipe.name.split()[0]),
+        'prefix': quote(ingredient.name[:3]),
+    }
+
+
+def call(client, method, url, payload=None):
+    """Run a request; return (response, seconds, SQL statements, size).
+    Streaming responses are consumed, so their queries are included.
+
+    Inside a transaction, the on_commit callbacks of the request (version
+    bumps) are run right after it, as its commit would, and measured with
+    it.
+    """
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        with TestCase.captureOnCommitCallbacks(execute=True):
+            response = getattr(client, method)(url, payload, format='json')
+            if response.streaming:
+                content = b''.join(response.streaming_content)
+            else:
+                content = response.content
+        elapsed = time.perf_counter() - started
+    return (response, elapsed,
+            [query['sql'] for query in queries.captured_queries],
+            len(content))
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
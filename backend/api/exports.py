@@ -0,0 +1,139 @@
+import csv
+import io
+import os
+from functools import lru_cache
+
+from django.conf import settings
+from django.db.models import F
+from django.utils.module_loading import import_string
+
+TITLE = 'Список покупок пользователя: {}'
+FOOTER = 'Сформировано с помощью Продуктового помощника'
+
+
+class ShoppingListRenderer:
+    """Base renderer of a shopping list file.
+
+    render() is a generator: it yields the header before the first
+    ingredient row is fetched, then one chunk per row, so the response can be
+    streamed while the aggregation query is still running.
+    """
+    format = None
+    content_type = None
+
+    @classmethod
+    def is_available(cls):
+        return True
+
+    def get_filename(self, user):
+        return f'{user.username}_shopping_list.{self.format}'
+
+    def render(self, user, ingredients):
+        raise NotImplementedError
+
+
+class TextRenderer(ShoppingListRenderer):
+    """Shopping list as plain text."""
+    format = 'txt'
+    content_type = 'text/plain; charset=utf-8'
+
+    def render(self, user, ingredients):
+        yield f'{TITLE.format(user.get_full_name())}\n\n'
+        for ingredient in ingredients:
+            yield (f'{ingredient["ingredient_name"]}: {ingredient["amount"]} '
+                   f'{ingredient["measure"]}\n')
+        yield f'\n{FOOTER}'
+
+
+class Echo:
+    """File-like object that hands back what csv.writer writes."""
+    @staticmethod
+    def write(value):
+        return value
+
+
+class CsvRenderer(ShoppingListRenderer):
+    """Shopping list as CSV, with a BOM so spreadsheets detect UTF-8."""
+    format = 'csv'
+    content_type = 'text/csv; charset=utf-8'
+
+    def render(self, user, ingredients):
+        writer = csv.writer(Echo())
+        yield '\ufeff' + writer.writerow(
+            ('Ингредиент', 'Количество', 'Единица измерения'))
+        for ingredient in ingredients:
+            yield writer.writerow((ingredient['ingredient_name'],
+                                   ingredient['amount'],
+                                   ingredient['measure']))
+
+
+class PdfRenderer(ShoppingListRenderer):
+    """Shopping list as PDF. Needs reportlab and a TTF font with Cyrillic.
+
+    The PDF cross-reference table is only known at the end, so the document
+    is sent in one chunk once all rows are drawn.
+    """
+    format = 'pdf'
+    content_type = 'application/pdf'
+    font_name = 'ShoppingListFont'
+    font_size = 12
+    margin = 50
+
+    @classmethod
+    def is_available(cls):
+        try:
+            import reportlab  # noqa: F401
+        except ImportError:
+            return False
+        return os.path.exists(settings.SHOPPING_LIST_PDF_FONT)
+
+    def render(self, user, ingredients):
+        from reportlab.lib.pagesizes import A4
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+        from reportlab.pdfgen import canvas
+
+        pdfmetrics.registerFont(
+            TTFont(self.font_name, settings.SHOPPING_LIST_PDF_FONT))
+        buffer = io.BytesIO()
+        page = canvas.Canvas(buffer, pagesize=A4)
+        _, height = A4
+        line_height = self.font_size * 1.5
+        page.setFont(self.font_name, self.font_size)
+        y = height - self.margin
+        page.drawString(self.margin, y, TITLE.format(user.get_full_name()))
+        y -= line_height * 2
+        for ingredient in ingredients:
+            if y < self.margin:
+                page.showPage()
+                page.setFont(self.font_name, self.font_size)
+                y = height - self.margin
+            page.drawString(
+                self.margin, y,
+                f'{ingredient["ingredient_name"]}: {ingredient["amount"]} '
+                f'{ingredient["measure"]}'
+            )
+            y -= line_height
+        page.drawString(self.margin, self.margin / 2, FOOTER)
+        page.save()
+        yield buffer.getvalue()
+
+
+def get_shopping_list(user):
+    """Rows of the user's shopping list: ingredient_name, measure, amount."""
+    return user.cart_ingredients.values(
+        'amount',
+        ingredient_name=F('ingredient__name'),
+        measure=F('ingredient__measurement_unit')
+    ).order_by('ingredient_name', 'measure')
+
+
+@lru_cache(maxsize=None)
+def get_renderer(file_format):
+    """Return the configured renderer for file_format or None."""
+    for path in settings.SHOPPING_LIST_RENDERERS:
+        renderer_class = import_string(path)
+        if (renderer_class.format == file_format
+                and renderer_class.is_available()):
+            return renderer_class()
+    return None
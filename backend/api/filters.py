@@ -1,5 +1,6 @@
 from django_filters.rest_framework import FilterSet, filters
-from recipes.models import Recipe
+from recipes import search
+from recipes.models import Recipe, Tag
 from rest_framework.filters import SearchFilter
 
 
@@ -10,15 +11,23 @@ class IngredientSearchFilter(SearchFilter):
 
 class RecipeFilters(FilterSet):
     """Filters for Recipes. Filters include tags, is_favorited,
-    is_in_shopping_cart, author."""
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
+    is_in_shopping_cart, author and full-text search over name and text.
+    Ordering by popularity reads the stored favorites_count and cart_count
+    counters; search results are ordered by rank unless ordering is given."""
+    tags = filters.ModelMultipleChoiceFilter(
+        field_name='tags__slug', to_field_name='slug',
+        queryset=Tag.objects.all())
     is_favorited = filters.BooleanFilter(method='get_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='get_is_in_shopping_cart')
+    search = filters.CharFilter(method='get_search')
+    ordering = filters.OrderingFilter(
+        fields=('created', 'favorites_count', 'cart_count'))
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart',
+                  'search')
 
     def get_is_favorited(self, queryset, name, value):
         if value:
@@ -29,3 +38,9 @@ class RecipeFilters(FilterSet):
         if value:
             return queryset.filter(cart=self.request.user.id)
         return queryset
+
+    def get_search(self, queryset, name, value):
+        queryset = search.search(queryset, value)
+        if self.data.get('ordering'):
+            return queryset
+        return queryset.order_by('-rank', '-created', '-id')
@@ -0,0 +1,130 @@
+import json
+import os
+from collections import defaultdict
+
+from api.benchmarks import (ENDPOINTS, call, create_payload, get_samples,
+                            percentile)
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+BUDGETS = os.path.join(settings.BASE_DIR, 'api', 'benchmark_budgets.json')
+METRICS = ('p95_ms', 'queries', 'bytes')
+
+
+class Command(BaseCommand):
+    help = ('Замеряет все эндпоинты API на текущей базе: задержку (p50, '
+            'p95), число SQL-запросов и размер ответа, и сверяет их с '
+            'бюджетами. Все изменения откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument(
+            '--budgets', default=BUDGETS,
+            help='JSON с бюджетами эндпоинтов (по умолчанию %(default)s).')
+        parser.add_argument(
+            '--output',
+            help='Записать результаты в JSON-файл ("-" - в stdout).')
+        parser.add_argument(
+            '--endpoint', action='append', dest='endpoints',
+            help='Замерять только эндпоинт с данным именем.')
+
+    def handle(self, *args, **options):
+        endpoints = [
+            endpoint for endpoint in ENDPOINTS
+            if not options['endpoints'] or endpoint[0] in options['endpoints']
+        ]
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            with transaction.atomic():
+                with TestCase.captureOnCommitCallbacks() as callbacks:
+                    samples = self.measure(endpoints, options['warmup'],
+                                           options['iterations'])
+                transaction.set_rollback(True)
+        # The caches were filled with the rolled back writes: bump their
+        # versions again.
+        for callback in callbacks:
+            callback()
+        with open(options['budgets'], encoding='utf-8') as file:
+            budgets = json.load(file)
+        results = {name: self.summarize(sample)
+                   for name, sample in samples.items()}
+        violations = self.check_budgets(results, budgets)
+        self.write(results, violations, options)
+        if violations:
+            raise CommandError(f'Превышено бюджетов: {len(violations)}.')
+
+    def measure(self, endpoints, warmup, iterations):
+        user, samples = get_samples()
+        if user is None:
+            raise CommandError(
+                'Нужны пользователи, рецепты, теги и ингредиенты: '
+                'заполните базу (manage.py seed_load).')
+        client = APIClient()
+        client.force_authenticate(user)
+        response, *_ = call(client, 'post', '/api/recipes/',
+                            create_payload(samples, 'собственный'))
+        samples['own_recipe'] = response.data['id']
+        measured = defaultdict(lambda: defaultdict(list))
+        for iteration in range(warmup + iterations):
+            for name, method, url, payload in endpoints:
+                response, elapsed, statements, size = call(
+                    client, method, url.format(**samples),
+                    payload and payload(samples, iteration))
+                if iteration < warmup:
+                    continue
+                measured[name]['ms'].append(elapsed * 1000)
+                measured[name]['queries'].append(len(statements))
+                measured[name]['bytes'].append(size)
+                measured[name]['statuses'].append(response.status_code)
+        return measured
+
+    @staticmethod
+    def summarize(sample):
+        return {
+            'p50_ms': round(percentile(sample['ms'], 0.5), 2),
+            'p95_ms': round(percentile(sample['ms'], 0.95), 2),
+            'queries': max(sample['queries']),
+            'bytes': max(sample['bytes']),
+            'statuses': sorted(set(sample['statuses'])),
+        }
+
+    @staticmethod
+    def check_budgets(results, budgets):
+        violations = []
+        for name, result in results.items():
+            if any(status >= 400 for status in result['statuses']):
+                violations.append(f'{name}: ответ {result["statuses"]}')
+            for metric in METRICS:
+                limit = budgets.get(name, {}).get(metric)
+                if limit is not None and result[metric] > limit:
+                    violations.append(
+                        f'{name}: {metric} {result[metric]} > {limit}')
+        return violations
+
+    def write(self, results, violations, options):
+        report = {
+            'created': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'iterations': options['iterations'],
+            'endpoints': results,
+            'violations': violations,
+        }
+        if options['output'] == '-':
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, indent=2)
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:24} p50 {result["p50_ms"]:8.2f} мс  '
+                f'p95 {result["p95_ms"]:8.2f} мс  '
+                f'запросов {result["queries"]:3}  '
+                f'байт {result["bytes"]:7}  {result["statuses"]}')
+        for violation in violations:
+            self.stdout.write(self.style.ERROR(violation))
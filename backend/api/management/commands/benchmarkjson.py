@@ -0,0 +1,70 @@
+import io
+import time
+
+from api.serializers import RecipeSerializer
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from foodgram import fastjson
+from recipes.models import Recipe
+from rest_framework import parsers, renderers
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+CANDIDATES = (
+    ('stdlib', renderers.JSONRenderer(), parsers.JSONParser()),
+    ('orjson', fastjson.JSONRenderer(), fastjson.JSONParser()),
+)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает рендеринг и разбор JSON стандартной библиотекой и '
+            'orjson на странице списка рецептов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100)
+        parser.add_argument('--iterations', type=int, default=200)
+
+    def handle(self, *args, **options):
+        if fastjson.orjson is None:
+            raise CommandError('orjson не установлен.')
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            data = self.get_payload(options['recipes'])
+        if not data['results']:
+            raise CommandError(
+                'Нет рецептов: заполните базу (manage.py seed_load).')
+        iterations = options['iterations']
+        outputs = {}
+        for name, renderer, parser in CANDIDATES:
+            content = renderer.render(data, 'application/json')
+            render_ms = self.measure(
+                lambda: renderer.render(data, 'application/json'),
+                iterations)
+            parse_ms = self.measure(
+                lambda: parser.parse(io.BytesIO(content)), iterations)
+            outputs[name] = parser.parse(io.BytesIO(content))
+            self.stdout.write(
+                f'{name:8} рендеринг {render_ms:8.3f} мс  '
+                f'разбор {parse_ms:8.3f} мс  байт {len(content)}')
+        if outputs['stdlib'] != outputs['orjson']:
+            raise CommandError('Результаты рендереров различаются.')
+        self.stdout.write(self.style.SUCCESS('Результаты совпадают.'))
+
+    @staticmethod
+    def get_payload(count):
+        """A page of the recipe list as the API returns it to a guest."""
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        recipes = Recipe.objects.order_by('-id')[:count]
+        return {
+            'count': Recipe.objects.count(),
+            'next': None,
+            'previous': None,
+            'results': RecipeSerializer(
+                recipes, many=True, context={'request': request}).data,
+        }
+
+    @staticmethod
+    def measure(function, iterations):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            function()
+        return (time.perf_counter() - started) * 1000 / iterations
@@ -0,0 +1,158 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from api.benchmarks import percentile
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.encoding import iri_to_uri
+
+HOST = '127.0.0.1'
+SERVERS = {
+    'wsgi': ('foodgram.wsgi:application',),
+    'asgi': ('foodgram.asgi:application',
+             '--worker-class', 'uvicorn.workers.UvicornWorker'),
+}
+PATHS = ('/api/recipes/?limit=6', '/api/tags/', '/api/ingredients/?name=а')
+START_TIMEOUT = 30
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def build_request(path, token=None):
+    lines = [f'GET {iri_to_uri(path)} HTTP/1.1', f'Host: {HOST}',
+             'Connection: close']
+    if token:
+        lines.append(f'Authorization: Token {token}')
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode()
+
+
+async def fetch(port, request):
+    """Status code of one request on a new connection."""
+    reader, writer = await asyncio.open_connection(HOST, port)
+    try:
+        writer.write(request)
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    return int(response.split(b' ', 2)[1])
+
+
+async def run_client(port, requests, deadline, results):
+    index = 0
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            status = await fetch(port, requests[index % len(requests)])
+        except (OSError, IndexError, ValueError):
+            status = None
+        results.append((status, time.perf_counter() - started))
+        index += 1
+
+
+async def run_slow_client(port, deadline):
+    """Keep a connection busy sending its headers a byte per second."""
+    try:
+        reader, writer = await asyncio.open_connection(HOST, port)
+        writer.write(f'GET /api/tags/ HTTP/1.1\r\nHost: {HOST}\r\n'
+                     'X-Slow: '.encode())
+        while time.monotonic() < deadline:
+            writer.write(b'a')
+            await writer.drain()
+            await asyncio.sleep(1)
+        writer.close()
+    except OSError:
+        pass
+
+
+async def load(port, requests, concurrency, slow_clients, duration):
+    deadline = time.monotonic() + duration
+    results = []
+    await asyncio.gather(
+        *(run_slow_client(port, deadline) for _ in range(slow_clients)),
+        *(run_client(port, requests, deadline, results)
+          for _ in range(concurrency)))
+    return results
+
+
+class Command(BaseCommand):
+    help = ('Запускает бэкенд под gunicorn в синхронном (WSGI) и '
+            'асинхронном (ASGI, uvicorn) вариантах с одинаковым числом '
+            'процессов и сравнивает пропускную способность при множестве '
+            'одновременных соединений, в том числе медленных клиентов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servers', nargs='+', choices=SERVERS,
+                            default=list(SERVERS))
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--duration', type=float, default=10)
+        parser.add_argument(
+            '--slow-clients', type=int, default=0,
+            help='Число соединений, передающих заголовки по байту в '
+                 'секунду.')
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help=f'Запрашиваемый адрес; по умолчанию {", ".join(PATHS)}.')
+        parser.add_argument(
+            '--token', help='Токен для запросов от имени пользователя.')
+
+    def handle(self, *args, **options):
+        requests = [build_request(path, options['token'])
+                    for path in options['paths'] or PATHS]
+        for name in options['servers']:
+            port = get_free_port()
+            server = self.start(name, port, options['workers'])
+            try:
+                results = asyncio.run(load(
+                    port, requests, options['concurrency'],
+                    options['slow_clients'], options['duration']))
+            finally:
+                server.terminate()
+                server.wait()
+            self.write(name, results, options['duration'])
+
+    @staticmethod
+    def start(name, port, workers):
+        env = {
+            **os.environ,
+            'ALLOWED_HOSTS': f'{os.getenv("ALLOWED_HOSTS", "")} {HOST}',
+        }
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', *SERVERS[name],
+             '--bind', f'{HOST}:{port}', '--workers', str(workers),
+             '--chdir', str(settings.BASE_DIR)],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        started = time.monotonic()
+        while time.monotonic() - started < START_TIMEOUT:
+            if server.poll() is not None:
+                raise CommandError(f'{name}: сервер не запустился.')
+            try:
+                asyncio.run(fetch(port, build_request('/api/tags/')))
+                return server
+            except OSError:
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError(f'{name}: сервер не ответил за '
+                           f'{START_TIMEOUT} с.')
+
+    def write(self, name, results, duration):
+        ok = [elapsed * 1000 for status, elapsed in results
+              if status is not None and status < 400]
+        errors = len(results) - len(ok)
+        if not ok:
+            self.stdout.write(self.style.ERROR(
+                f'{name}: нет успешных ответов, ошибок {errors}.'))
+            return
+        self.stdout.write(
+            f'{name:5} {len(ok) / duration:8.1f} запросов/с  '
+            f'p50 {percentile(ok, 0.5):8.2f} мс  '
+            f'p95 {percentile(ok, 0.95):8.2f} мс  ошибок {errors}')
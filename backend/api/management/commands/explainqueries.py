@@ -0,0 +1,81 @@
+from api.benchmarks import call, get_samples
+from api.plans import PlanInspector
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+HOT_REQUESTS = (
+    ('get', '/api/recipes/'),
+    ('get', '/api/recipes/?tags={tag}'),
+    ('get', '/api/recipes/?author={author}'),
+    ('get', '/api/recipes/?is_favorited=1'),
+    ('get', '/api/recipes/?is_in_shopping_cart=1'),
+    ('get', '/api/recipes/?ordering=-favorites_count'),
+    ('get', '/api/recipes/?cursor=&limit=6'),
+    ('get', '/api/recipes/?search={word}'),
+    ('get', '/api/recipes/{recipe}/'),
+    ('post', '/api/recipes/{recipe}/favorite/'),
+    ('delete', '/api/recipes/{recipe}/favorite/'),
+    ('post', '/api/recipes/{recipe}/shopping_cart/'),
+    ('delete', '/api/recipes/{recipe}/shopping_cart/'),
+    ('get', '/api/recipes/download_shopping_cart/'),
+    ('get', '/api/users/'),
+    ('get', '/api/users/{author}/'),
+    ('get', '/api/users/subscriptions/?recipes_limit=3'),
+)
+
+
+class Command(BaseCommand):
+    help = ('Выполняет основные запросы API на текущей базе, выводит '
+            'планы их SQL-запросов (EXPLAIN) и завершается с ошибкой, '
+            'если какой-либо запрос полностью сканирует большую таблицу. '
+            'Все изменения откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-rows', type=int, default=10000,
+            help='Таблицы меньшего размера разрешено сканировать целиком.')
+
+    def handle(self, *args, **options):
+        inspector = PlanInspector(connection, options['min_rows'])
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            with transaction.atomic():
+                problems = self.check_requests(inspector,
+                                               options['verbosity'])
+                transaction.set_rollback(True)
+        if problems:
+            raise CommandError(
+                f'Полных сканирований больших таблиц: {problems}.')
+        self.stdout.write(self.style.SUCCESS(
+            'Полных сканирований больших таблиц не найдено.'))
+
+    def check_requests(self, inspector, verbosity):
+        user, samples = get_samples()
+        if user is None:
+            raise CommandError(
+                'Нужны пользователи, рецепты, теги и ингредиенты: '
+                'заполните базу (manage.py seed_load).')
+        client = APIClient()
+        client.force_authenticate(user)
+        problems = 0
+        for method, url in HOT_REQUESTS:
+            url = url.format(**samples)
+            response, _, statements, _ = call(client, method, url)
+            self.stdout.write(
+                f'{method.upper()} {url}: {response.status_code}, '
+                f'SQL-запросов {len(statements)}')
+            for sql in filter(inspector.is_explainable, statements):
+                problems += self.check_plan(inspector, sql, verbosity)
+        return problems
+
+    def check_plan(self, inspector, sql, verbosity):
+        lines, scans = inspector.explain(sql)
+        if verbosity > 1 or scans:
+            self.stdout.write(f'  {sql}')
+            for line in lines:
+                self.stdout.write(f'    {line}')
+        for table, rows in scans:
+            self.stdout.write(self.style.ERROR(
+                f'  Полное сканирование {table} ({rows} строк)'))
+        return len(scans)
@@ -0,0 +1,193 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags, quote_etag, urlencode
+from foodgram.db_routers import use_primary
+from foodgram.metrics import cache_result
+from recipes.versions import (aget_version, aget_versions, get_version,
+                              get_versions)
+from rest_framework import status
+from rest_framework.response import Response
+
+
+class VersionedReferenceMixin:
+    """Serve read-only reference data by version.
+
+    Every response carries an ETag built from the version of
+    version_namespace, so a client repeating If-None-Match gets 304 without
+    any DB or serializer work. Serialized payloads are cached per version,
+when is_cacheable().
+    The a-prefixed methods do the same for AsyncReadMixin views. Payloads
+    are built from the primary database, never from a lagging replica.
+    """
+    version_namespace = None
+
+    def is_cacheable(self, request):
+        """Whether the payload is worth a cache entry; others are built on
+        every request and only get the ETag."""
+        return True
+
+    def get_etag(self, request, version):
+        representation = (
+            f'{request.accepted_renderer.format}:{request.get_full_path()}'
+        )
+        digest = hashlib.sha1(representation.encode()).hexdigest()[:16]
+        return quote_etag(f'{self.version_namespace}-{version}-{digest}')
+
+    @staticmethod
+    def is_not_modified(request, etag):
+        if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        return etag in if_none_match or '*' in if_none_match
+
+    @staticmethod
+    def set_etag(response, etag):
+        response['ETag'] = etag
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    def versioned_response(self, handler, request, *args, **kwargs):
+        etag = self.get_etag(request, get_version(self.version_namespace))
+        if self.is_not_modified(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        elif not self.is_cacheable(request):
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+        else:
+            cache_key = f'reference:{etag}'
+            data = cache.get(cache_key)
+            cache_result('reference', data is not None)
+            if data is not None:
+                response = Response(data)
+            else:
+                with use_primary():
+                    response = handler(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                cache.set(cache_key, response.data,
+                          settings.REFERENCE_CACHE_TIMEOUT)
+        return self.set_etag(response, etag)
+
+    async def aversioned_response(self, handler, request, *args, **kwargs):
+        etag = self.get_etag(
+            request, await aget_version(self.version_namespace))
+        if self.is_not_modified(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        elif not self.is_cacheable(request):
+            response = await handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+        else:
+            cache_key = f'reference:{etag}'
+            data = await cache.aget(cache_key)
+            cache_result('reference', data is not None)
+            if data is not None:
+                response = Response(data)
+            else:
+                with use_primary():
+                    response = await handler(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                await cache.aset(cache_key, response.data,
+                                 settings.REFERENCE_CACHE_TIMEOUT)
+        return self.set_etag(response, etag)
+
+    def list(self, request, *args, **kwargs):
+        return self.versioned_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.versioned_response(
+            super().retrieve, request, *args, **kwargs)
+
+    async def alist(self, request, *args, **kwargs):
+        return await self.aversioned_response(
+            super().alist, request, *args, **kwargs)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self.aversioned_response(
+            super().aretrieve, request, *args, **kwargs)
+
+
+class AnonymousCacheMixin:
+    """Cache list and detail responses for anonymous users.
+
+    The key combines the versions of the namespaces the response depends on
+    (get_cache_namespaces) with the URL and its sorted query string. A data
+    change never deletes entries: it bumps a version, so new keys are used
+    and the stale entries are evicted from the 'responses' cache (least
+    recently used first with the local memory backend) or expire. The
+    a-prefixed methods do the same for AsyncReadMixin views. Cached
+    responses are built from the primary database.
+    """
+
+    def get_cache_namespaces(self):
+        raise NotImplementedError
+
+    def get_response_cache_key(self, request, versions):
+        query = urlencode(sorted(
+            (key, value) for key, values in request.query_params.lists()
+            for value in values
+        ))
+        url = f'{request.build_absolute_uri(request.path)}?{query}'
+        digest = hashlib.sha1(url.encode()).hexdigest()
+        versions = '.'.join(map(str, versions))
+        return f'response:{self.basename}-{self.action}:{versions}:{digest}'
+
+    @staticmethod
+    def mark_cached(response, hit):
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+        responses = caches['responses']
+        cache_key = self.get_response_cache_key(
+            request, get_versions(self.get_cache_namespaces()))
+        data = responses.get(cache_key)
+        cache_result('responses', data is not None)
+        if data is not None:
+            response = Response(data)
+        else:
+            with use_primary():
+                response = handler(request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                responses.set(cache_key, response.data,
+                              settings.RESPONSE_CACHE_TIMEOUT)
+        return self.mark_cached(response, data is not None)
+
+    async def acached_response(self, handler, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return await handler(request, *args, **kwargs)
+        responses = caches['responses']
+        cache_key = self.get_response_cache_key(
+            request, await aget_versions(self.get_cache_namespaces()))
+        data = await responses.aget(cache_key)
+        cache_result('responses', data is not None)
+        if data is not None:
+            response = Response(data)
+        else:
+            with use_primary():
+                response = await handler(request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                await responses.aset(cache_key, response.data,
+                                     settings.RESPONSE_CACHE_TIMEOUT)
+        return self.mark_cached(response, data is not None)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs)
+
+    async def alist(self, request, *args, **kwargs):
+        return await self.acached_response(
+            super().alist, request, *args, **kwargs)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self.acached_response(
+            super().aretrieve, request, *args, **kwargs)
@@ -0,0 +1,94 @@
+import re
+
+EXPLAIN = {
+    'postgresql': 'EXPLAIN (FORMAT JSON) ',
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+}
+EXPLAINABLE = ('SELECT', 'UPDATE', 'DELETE')
+SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?"?(\w+)"?(.*)$')
+SQLITE_ALIAS = re.compile(r'"(\w+)" (?:AS )?(\w+)')
+
+
+class PlanInspector:
+    """Explains SQL statements and reports full scans of large tables.
+
+    A scan counts as full when the planner reads the whole table rather
+    than an index: Seq Scan on PostgreSQL, SCAN without USING on SQLite.
+    Tables smaller than min_rows are ignored, since scanning them is what
+    the planner should do, and so is the unfiltered COUNT(*) of page number
+    pagination, which has to read the whole table anyway.
+    """
+
+    def __init__(self, connection, min_rows):
+        self.connection = connection
+        self.min_rows = min_rows
+        self.sizes = {}
+
+    @staticmethod
+    def is_explainable(sql):
+        sql = sql.strip().upper()
+        if sql.startswith('SELECT COUNT(*)') and ' WHERE ' not in sql:
+            return False
+        return sql.startswith(EXPLAINABLE)
+
+    def explain(self, sql):
+        """Return (plan lines, [(table, rows)] of large full scans)."""
+        with self.connection.cursor() as cursor:
+            cursor.execute(EXPLAIN[self.connection.vendor] + sql)
+            rows = cursor.fetchall()
+        if self.connection.vendor == 'postgresql':
+            return self.inspect_postgresql(rows[0][0][0]['Plan'])
+        return self.inspect_sqlite(rows, sql)
+
+    def inspect_postgresql(self, node, depth=0):
+        name = node['Node Type']
+        if 'Relation Name' in node:
+            name = f'{name} on {node["Relation Name"]}'
+        if 'Index Name' in node:
+            name = f'{name} using {node["Index Name"]}'
+        lines, scans = ['  ' * depth + name], []
+        if node['Node Type'] == 'Seq Scan':
+            scans.extend(self.large(node['Relation Name']))
+        for child in node.get('Plans', ()):
+            child_lines, child_scans = self.inspect_postgresql(
+                child, depth + 1)
+            lines.extend(child_lines)
+            scans.extend(child_scans)
+        return lines, scans
+
+    def inspect_sqlite(self, rows, sql):
+        aliases = {alias: table for table, alias in SQLITE_ALIAS.findall(sql)}
+        lines, scans = [], []
+        for row in rows:
+            detail = row[-1]
+            lines.append(detail)
+            match = SQLITE_SCAN.match(detail)
+            if match is None or 'USING' in match[2] or 'VIRTUAL' in match[2]:
+                continue
+            scans.extend(self.large(aliases.get(match[1], match[1])))
+        return lines, scans
+
+    def large(self, table):
+        rows = self.table_size(table)
+        if rows is None or rows < self.min_rows:
+            return []
+        return [(table, rows)]
+
+    def table_size(self, table):
+        if table not in self.sizes:
+            self.sizes[table] = self.count_rows(table)
+        return self.sizes[table]
+
+    def count_rows(self, table):
+        if table not in self.connection.introspection.table_names():
+            return None
+        with self.connection.cursor() as cursor:
+            if self.connection.vendor == 'postgresql':
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class '
+                    'WHERE relname = %s', [table])
+            else:
+                cursor.execute(
+                    f'SELECT count(*) FROM '
+                    f'{self.connection.ops.quote_name(table)}')
+            return cursor.fetchone()[0]
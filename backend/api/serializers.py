@@ -1,10 +1,24 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import models
+from django.db.models import Prefetch, prefetch_related_objects
+from django.utils.functional import cached_property
 from drf_extra_fields.fields import Base64ImageField
+from foodgram.db_routers import use_primary
+from foodgram.metrics import cache_result
+from foodgram.profiling import TimedSerializerMixin
+from recipes.images import get_srcset
 from recipes.models import Ingredient, IngredientAmount, Recipe, Tag
+from recipes.versions import INGREDIENTS, TAGS, author_namespace, get_versions
 from rest_framework import serializers
-from users.serializers import UserSerializer
+from tasks.models import Task
+from users.relations import get_relations
+from users.serializers import RelationsListSerializer, UserSerializer
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for model Tag."""
     class Meta:
         model = Tag
@@ -12,7 +26,7 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = '__all__',
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for model Ingredient."""
     class Meta:
         model = Ingredient
@@ -20,7 +34,8 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = '__all__',
 
 
-class IngredientAmountSerializer(serializers.ModelSerializer):
+class IngredientAmountSerializer(TimedSerializerMixin,
+                                 serializers.ModelSerializer):
     """Serializer for model IngredientAmount. """
     id = serializers.ReadOnlyField(source='ingredient.id')
     name = serializers.ReadOnlyField(source='ingredient.name')
@@ -33,14 +48,37 @@ class IngredientAmountSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
-class RecipeSerializer(serializers.ModelSerializer):
-    """Serializer for model Recipe."""
+class RecipeListSerializer(RelationsListSerializer):
+    """Loads the cached bodies of all recipes at once."""
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.Manager) else data)
+        self.child.load_bodies(items)
+        return super().to_representation(items)
+
+
+class RecipeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Serializer for model Recipe.
+
+    Everything but is_favorited, is_in_shopping_cart and
+    author.is_subscribed is the same for every viewer, so that body is
+    cached in the 'fragments' cache per recipe, its changed time and its
+    author's version, and the related objects are only loaded, from the
+    primary database, for recipes missing from it.
+    """
+    BODY_PREFETCH = (
+        'tags',
+        'author',
+        Prefetch('ingredientamount_set',
+                 queryset=IngredientAmount.objects.select_related(
+                     'ingredient')),
+    )
     tags = TagSerializer(many=True, read_only=True)
     author = UserSerializer(read_only=True)
     ingredients = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField(read_only=True)
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
     image = Base64ImageField()
+    srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -53,26 +91,121 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'srcset',
             'text',
             'cooking_time',
         )
+        list_serializer_class = RecipeListSerializer
+
+    @cached_property
+    def body_key_prefix(self):
+        """Everything a cached body depends on besides the recipe and its
+        author: the tag and ingredient versions and the host of the
+        absolute image URLs."""
+        request = self.context.get('request')
+        host = request.build_absolute_uri('/') if request else ''
+        versions = '.'.join(map(str, get_versions((TAGS, INGREDIENTS))))
+        digest = hashlib.sha1(host.encode()).hexdigest()[:12]
+        return f'recipe-body:{versions}:{digest}'
+
+    @cached_property
+    def author_versions(self):
+        return {}
+
+    def load_author_versions(self, author_ids):
+        """Fetch the versions of the authors not seen yet with one cache
+        query: a changed author only invalidates the bodies of their
+        recipes."""
+        missing = list(set(author_ids) - self.author_versions.keys())
+        if missing:
+            self.author_versions.update(zip(missing, get_versions(
+                [author_namespace(author_id) for author_id in missing])))
+
+    def get_body_key(self, recipe):
+        self.load_author_versions((recipe.author_id,))
+        return (f'{self.body_key_prefix}:{recipe.pk}:'
+                f'{recipe.changed.timestamp()}:'
+                f'{self.author_versions[recipe.author_id]}')
+
+    def load_bodies(self, recipes):
+        """Attach the cached bodies of recipes with one cache query and
+        prefetch the related objects of the others only."""
+        self.load_author_versions(recipe.author_id for recipe in recipes)
+        keys = {self.get_body_key(recipe): recipe for recipe in recipes}
+        bodies = caches['fragments'].get_many(keys)
+        missing = []
+        for key, recipe in keys.items():
+            cache_result('fragments', key in bodies)
+            if key in bodies:
+                recipe.cached_body = bodies[key]
+            else:
+                missing.append(recipe)
+        with use_primary():
+            prefetch_related_objects(missing, *self.BODY_PREFETCH)
+
+    def get_body(self, instance):
+        body = getattr(instance, 'cached_body', None)
+        if body is not None:
+            return body
+        key = self.get_body_key(instance)
+        body = caches['fragments'].get(key)
+        cache_result('fragments', body is not None)
+        if body is None:
+            with use_primary():
+                if hasattr(instance, 'author_is_subscribed'):
+                    instance.author.is_subscribed = (
+                        instance.author_is_subscribed)
+                body = super().to_representation(instance)
+            caches['fragments'].set(key, body,
+                                    settings.FRAGMENT_CACHE_TIMEOUT)
+        return body
+
+    def to_representation(self, instance):
+        """The cached viewer-independent body with the flags of the request
+        user merged in."""
+        body = self.get_body(instance)
+        if hasattr(instance, 'author_is_subscribed'):
+            is_subscribed = instance.author_is_subscribed
+        else:
+            is_subscribed = get_relations(
+                self.context.get('request')).is_subscribed_to(
+                instance.author_id)
+        return {
+            **body,
+            'author': {**body['author'], 'is_subscribed': is_subscribed},
+            'is_favorited': self.get_is_favorited(instance),
+            'is_in_shopping_cart': self.get_is_in_shopping_cart(instance),
+        }
 
     @staticmethod
     def get_ingredients(obj):
-        queryset = IngredientAmount.objects.filter(recipe=obj)
+        prefetched = getattr(obj, '_prefetched_objects_cache', {})
+        if 'ingredientamount_set' in prefetched:
+            queryset = prefetched['ingredientamount_set']
+        else:
+            queryset = IngredientAmount.objects.filter(
+                recipe=obj).select_related('ingredient')
         return IngredientAmountSerializer(queryset, many=True).data
 
+    def get_srcset(self, obj):
+        return get_srcset(obj, self.context.get('request'))
+
+    def prime_relations(self, recipes):
+        if recipes and not hasattr(recipes[0], 'is_favorited'):
+            get_relations(self.context.get('request')).prime(
+                author_ids=[recipe.author_id for recipe in recipes],
+                recipe_ids=[recipe.pk for recipe in recipes])
+
     def get_is_favorited(self, obj):
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return user.favorites.filter(id=obj.id).exists()
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
+        return get_relations(self.context.get('request')).is_favorited(obj)
 
     def get_is_in_shopping_cart(self, obj):
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return user.user_cart.filter(id=obj.id).exists()
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
+        return get_relations(
+            self.context.get('request')).is_in_shopping_cart(obj)
 
     def validate(self, data):
         name = str(self.initial_data.get('name')).strip()
@@ -93,7 +226,13 @@ class RecipeSerializer(serializers.ModelSerializer):
             tags_list.append(tag)
 
         valid_ingredients = []
+        ingredients_list = []
         for ingredient in ingredients:
+            if ingredient.get('id') in ingredients_list:
+                raise serializers.ValidationError({
+                    'ingredients': 'Ингредиенты должны быть уникальными.'
+                })
+            ingredients_list.append(ingredient.get('id'))
             amount = ingredient.get('amount')
             if int(amount) <= 0:
                 raise serializers.ValidationError({
@@ -108,3 +247,14 @@ class RecipeSerializer(serializers.ModelSerializer):
         data['ingredients'] = valid_ingredients
         data['author'] = author
         return data
+
+
+class TaskSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Serializer for model Task."""
+    url = serializers.HyperlinkedIdentityField(view_name='api:tasks-detail')
+
+    class Meta:
+        model = Task
+        fields = ('id', 'url', 'name', 'status', 'attempts', 'result',
+                  'created', 'changed')
+        read_only_fields = '__all__',
@@ -0,0 +1,39 @@
+from datetime import timedelta
+from uuid import uuid4
+
+from api.exports import get_renderer, get_shopping_list
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from tasks.queue import enqueue, task
+from users.models import User
+
+
+@task(name='api.export_shopping_list')
+def export_shopping_list(user_id, file_format):
+    """Build the shopping list file in the media storage and return its
+    URL. The file is deleted after SHOPPING_LIST_EXPORT_TTL seconds."""
+    user = User.objects.get(pk=user_id)
+    renderer = get_renderer(file_format)
+    content = b''.join(
+        chunk.encode() if isinstance(chunk, str) else chunk
+        for chunk in renderer.render(user, get_shopping_list(user).iterator())
+    )
+    name = default_storage.save(
+        f'shopping_lists/{uuid4().hex}/{renderer.get_filename(user)}',
+        ContentFile(content)
+    )
+    expires = timezone.now() + timedelta(
+        seconds=settings.SHOPPING_LIST_EXPORT_TTL)
+    enqueue(delete_export, run_after=expires, name=name)
+    return {'file': default_storage.url(name),
+            'content_type': renderer.content_type,
+            'expires': expires.isoformat()}
+
+
+@task(name='api.delete_export')
+def delete_export(name):
+    """Delete an exported shopping list: it holds personal data and is
+    served publicly by its URL."""
+    default_storage.delete(name)
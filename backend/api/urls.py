@@ -1,4 +1,4 @@
-from api.views import IngredientViewSet, RecipeViewSet, TagViewSet
+from api.views import IngredientViewSet, RecipeViewSet, TagViewSet, TaskViewSet
 from django.urls import include, path
 from rest_framework import routers
 
@@ -8,6 +8,7 @@ router = routers.DefaultRouter()
 router.register("tags", TagViewSet, basename="tags")
 router.register("ingredients", IngredientViewSet, basename="ingredients")
 router.register("recipes", RecipeViewSet, basename="recipes")
+router.register("tasks", TaskViewSet, basename="tasks")
 
 
 urlpatterns = [
@@ -1,30 +1,47 @@
+from api.autocomplete import ingredient_index
+from api.exports import get_renderer, get_shopping_list
 from api.filters import IngredientSearchFilter, RecipeFilters
+from api.mixins import AnonymousCacheMixin, VersionedReferenceMixin
 from api.permissions import AdminOrReadOnly, AuthorOrReadOnly
 from api.serializers import (IngredientSerializer, RecipeSerializer,
-                             TagSerializer)
-from django.db.models import F, Sum
-from django.http import HttpResponse
+                             TagSerializer, TaskSerializer)
+from api.tasks import export_shopping_list
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BooleanField, Exists, OuterRef, Value
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control, patch_vary_headers
 from django_filters.rest_framework import DjangoFilterBackend
+from foodgram.asyncviews import AsyncReadMixin
+from recipes import cart
 from recipes.models import Ingredient, IngredientAmount, Recipe, Tag
+from recipes.tasks import discard_image_variants, schedule_image_processing
+from recipes.versions import (AUTHORS, INGREDIENTS, POPULARITY, RECIPES, TAGS,
+                              recipe_namespace)
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from tasks.queue import enqueue
 from users.models import User
 from users.paginators import PageLimitPagination
 from users.serializers import ShortRecipeSerializer
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(VersionedReferenceMixin, AsyncReadMixin,
+                 viewsets.ReadOnlyModelViewSet):
     """ViewSet for model Tag."""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AdminOrReadOnly,)
     pagination_class = None
+    version_namespace = TAGS
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(VersionedReferenceMixin, AsyncReadMixin,
+                        viewsets.ReadOnlyModelViewSet):
     """ViewSet for model Ingredient."""
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
@@ -32,26 +49,130 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = None
     filter_backends = (IngredientSearchFilter,)
     search_fields = ('^name',)
+    version_namespace = INGREDIENTS
 
+    def is_cacheable(self, request):
+        # Prefix lookups in the index take microseconds: caching each typed
+        # prefix would cost more than it saves.
+        return not self.get_search_name(request)
 
-class RecipeViewSet(viewsets.ModelViewSet):
-    """ViewSet for model Recipe."""
-    queryset = Recipe.objects.select_related('author')
+    def list(self, request, *args, **kwargs):
+        return self.versioned_response(self.autocomplete, request)
+
+    async def alist(self, request, *args, **kwargs):
+        return await self.aversioned_response(
+            sync_to_async(self.autocomplete), request)
+
+    @staticmethod
+    def get_search_name(request):
+        return request.query_params.get(
+            IngredientSearchFilter.search_param, '').strip()
+
+    def autocomplete(self, request):
+        """Autocomplete is answered from the in-memory prefix index."""
+        name = self.get_search_name(request)
+        limit = None
+        if name:
+            limit = settings.INGREDIENT_SEARCH_LIMIT
+            try:
+                limit = max(int(request.query_params['limit']), 1)
+            except (KeyError, ValueError):
+                pass
+        return Response(ingredient_index.search(name, limit))
+
+
+class RecipeViewSet(AnonymousCacheMixin, AsyncReadMixin,
+                    viewsets.ModelViewSet):
+    """ViewSet for model Recipe. Anonymous list and detail responses are
+    cached."""
     serializer_class = RecipeSerializer
     permission_classes = (AuthorOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilters
     pagination_class = PageLimitPagination
+    keyset_ordering = ('-created', '-id')
     http_method_names = ['get', 'post', 'patch', 'delete']
 
+    def get_queryset(self):
+        """Recipes with the per-user flags annotated with Exists subqueries.
+        Related objects are loaded by RecipeSerializer, only for recipes
+        whose body is not cached."""
+        user = self.request.user
+        if user.is_anonymous:
+            is_subscribed = is_favorited = is_in_shopping_cart = Value(
+                False, output_field=BooleanField())
+        else:
+            is_subscribed = Exists(User.subscribe.through.objects.filter(
+                from_user=user, to_user=OuterRef('author_id')))
+            is_favorited = Exists(Recipe.favorite.through.objects.filter(
+                recipe=OuterRef('pk'), user=user))
+            is_in_shopping_cart = Exists(Recipe.cart.through.objects.filter(
+                recipe=OuterRef('pk'), user=user))
+        return Recipe.objects.annotate(
+            author_is_subscribed=is_subscribed,
+            is_favorited=is_favorited,
+            is_in_shopping_cart=is_in_shopping_cart,
+        )
+
+    def get_cache_namespaces(self):
+        """Data shown in a recipe: the recipe with its ingredient amounts
+        and tags, the tag and ingredient references and the author. Lists
+        also depend on every recipe and, when ordered by them, on the
+        favorites and cart counters."""
+        namespaces = [TAGS, INGREDIENTS, AUTHORS]
+        if self.action == 'retrieve':
+            # /api/recipes/01/ is recipe 1: bumps use the normalized id.
+            try:
+                recipe_id = int(self.kwargs['pk'])
+            except ValueError:
+                raise Http404
+            return [*namespaces, recipe_namespace(recipe_id)]
+        namespaces.append(RECIPES)
+        if 'count' in self.request.query_params.get('ordering', ''):
+            namespaces.append(POPULARITY)
+        return namespaces
+
     @staticmethod
-    def create_ingredients(ingredients, recipe):
-        for ingredient in ingredients:
-            IngredientAmount.objects.create(
-                recipe=recipe, ingredient_id=ingredient.get('id'),
-                amount=ingredient.get('amount')
-            )
+    def save_ingredients(ingredients, recipe, created=False):
+        """Write only the difference between stored and submitted
+        ingredient amounts, with one bulk statement per kind of change.
+        Shopping carts containing the recipe get the same difference."""
+        amounts = {
+            int(ingredient.get('id')): int(ingredient.get('amount'))
+            for ingredient in ingredients
+        }
+        stored = {} if created else {
+            ingredient_amount.ingredient_id: ingredient_amount
+            for ingredient_amount in IngredientAmount.objects.filter(
+                recipe=recipe)
+        }
+        deltas = {
+            ingredient_id: -ingredient_amount.amount
+            for ingredient_id, ingredient_amount in stored.items()
+        }
+        for ingredient_id, amount in amounts.items():
+            deltas[ingredient_id] = deltas.get(ingredient_id, 0) + amount
+        removed = stored.keys() - amounts.keys()
+        if removed:
+            IngredientAmount.objects.filter(
+                recipe=recipe, ingredient_id__in=removed).delete()
+        changed = []
+        for ingredient_id, ingredient_amount in stored.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and amount != ingredient_amount.amount:
+                ingredient_amount.amount = amount
+                changed.append(ingredient_amount)
+        IngredientAmount.objects.bulk_update(changed, ['amount'])
+        IngredientAmount.objects.bulk_create(
+            IngredientAmount(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount)
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in stored
+        )
+        if not created:
+            cart.change_recipe(recipe.pk, deltas)
 
+    @transaction.atomic
     def perform_create(self, serializer):
         name = serializer.validated_data.get('name')
         if Recipe.objects.filter(name=name, author=self.request.user).exists():
@@ -62,14 +183,19 @@ class RecipeViewSet(viewsets.ModelViewSet):
         image = serializer.validated_data.pop('image')
         ingredients = serializer.validated_data.pop('ingredients')
         recipe = serializer.save(image=image)
-        self.create_ingredients(ingredients, recipe)
+        self.save_ingredients(ingredients, recipe, created=True)
+        schedule_image_processing(recipe)
 
+    @transaction.atomic
     def perform_update(self, serializer):
         ingredients = serializer.validated_data.pop('ingredients')
-        recipe = serializer.save()
-        recipe.ingredients.clear()
-        self.create_ingredients(ingredients, recipe)
-        recipe.save()
+        if 'image' in serializer.validated_data:
+            discard_image_variants(serializer.instance)
+            recipe = serializer.save()
+            schedule_image_processing(recipe)
+        else:
+            recipe = serializer.save()
+        self.save_ingredients(ingredients, recipe)
 
     @action(detail=True, methods=['post', 'delete'],
             permission_classes=[permissions.IsAuthenticated],
@@ -130,27 +256,46 @@ class RecipeViewSet(viewsets.ModelViewSet):
         if not user.user_cart.exists():
             return Response({'detail': 'Список покупок пуст.'},
                             status=status.HTTP_400_BAD_REQUEST)
-        ingredients = IngredientAmount.objects.filter(
-            recipe__in=(user.user_cart.values('id'))
-        ).values(
-            ingredient_name=F('ingredient__name'),
-            measure=F('ingredient__measurement_unit')
-        ).annotate(amount=Sum('amount'))
-
-        filename = f'{user.username}_shopping_list.txt'
-        shopping_list = (
-            f'Список покупок пользователя: {user.get_full_name()}\n\n'
+        renderer = get_renderer(request.query_params.get('type', 'txt'))
+        if renderer is None:
+            return Response({'type': 'Неподдерживаемый формат файла.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if request.query_params.get('async') in ('1', 'true'):
+            return self.export_shopping_cart(request, renderer)
+        response = StreamingHttpResponse(
+            renderer.render(user, get_shopping_list(user).iterator()),
+            content_type=renderer.content_type
         )
-        for ingredient in ingredients:
-            shopping_list += (
-                f'{ingredient["ingredient_name"]}: {ingredient["amount"]} '
-                f'{ingredient["measure"]}\n'
-            )
-
-        shopping_list += '\nСформировано с помощью Продуктового помощника'
-
-        response = HttpResponse(
-            shopping_list, content_type='text.txt; charset=utf-8'
+        response['Content-Disposition'] = (
+            f'attachment; filename="{renderer.get_filename(user)}"'
         )
-        response['Content-Disposition'] = f'attachment; filename={filename}'
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Authorization',))
         return response
+
+    def export_shopping_cart(self, request, renderer):
+        """Queue the shopping list file to be built by a worker. The client
+        polls the returned task for the file URL. Repeating a request with
+        the same Idempotency-Key header returns the same task."""
+        user = request.user
+        key = request.headers.get('Idempotency-Key')
+        job = enqueue(
+            export_shopping_list,
+            idempotency_key=key and f'shopping-list:{user.pk}:{key}',
+            user=user,
+            user_id=user.pk,
+            file_format=renderer.format,
+        )
+        serializer = TaskSerializer(job, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED,
+                        headers={'Location': serializer.data['url']})
+
+
+class TaskViewSet(viewsets.ReadOnlyModelViewSet):
+    """Status of the background tasks started by the user."""
+    serializer_class = TaskSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+    pagination_class = PageLimitPagination
+
+    def get_queryset(self):
+        return self.request.user.tasks.all()
@@ -12,5 +12,11 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+# Read endpoints of recipes, tags, ingredients and subscriptions are served
+# by async views under ASGI; see foodgram.asyncviews.AsyncReadMixin.
+os.environ.setdefault('ASYNC_READ_API', 'True')
+# Threads of async views do not outlive the request, nor would persistent
+# connections opened in them.
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Alias of the replica chosen for the reads of the current request.
+read_alias = ContextVar('read_alias', default=None)
+
+# Replicas that failed to connect: alias -> (retry at, backoff seconds).
+unhealthy = {}
+
+
+@contextmanager
+def use_primary():
+    """Read from the primary inside the block. For reads whose result is
+    cached under the current data versions: a lagging replica would store
+    old data under the new version."""
+    token = read_alias.set(None)
+    try:
+        yield
+    finally:
+        read_alias.reset(token)
+
+
+def is_available(alias):
+    """Connect to the replica, or skip it with exponential backoff after a
+    failure. Persistent connections are health-checked first."""
+    retry_at, backoff = unhealthy.get(alias, (0, 0))
+    if time.monotonic() < retry_at:
+        return False
+    connection = connections[alias]
+    try:
+        connection.close_if_health_check_failed()
+        connection.ensure_connection()
+    except DatabaseError as exc:
+        backoff = min(max(backoff * 2, 1), settings.DATABASE_REPLICA_BACKOFF)
+        unhealthy[alias] = time.monotonic() + backoff, backoff
+        logger.warning('Replica %s is unavailable, retrying in %s s: %s',
+                       alias, backoff, exc)
+        return False
+    unhealthy.pop(alias, None)
+    return True
+
+
+def get_pin_key(request):
+    """The client, by its token, or by its address without one."""
+    client = (request.META.get('HTTP_AUTHORIZATION')
+              or request.META.get('REMOTE_ADDR', ''))
+    return f'db-pin:{hashlib.sha1(client.encode()).hexdigest()}'
+
+
+def choose_replica(request):
+    """A random available replica for a GET or HEAD request of a client
+    that has not written anything for DATABASE_PIN_SECONDS, else None."""
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    if cache.get(get_pin_key(request)):
+        return None
+    replicas = list(settings.DATABASE_REPLICAS)
+    random.shuffle(replicas)
+    return next(filter(is_available, replicas), None)
+
+
+class ReplicaRouter:
+    """Send the reads of GET and HEAD requests to DATABASE_REPLICAS.
+
+    Everything else goes to the primary: writes, reads in transactions,
+    reads outside requests (tasks, management commands), and tokens, so a
+    token just issued by the login works at once. After an unsafe request,
+    ReplicaMiddleware pins the client to the primary for
+    DATABASE_PIN_SECONDS, so it reads its own writes despite the
+    replication lag. The pin is kept in the default cache, which must be
+    shared by the worker processes (recipes.W002).
+    """
+    primary_models = ('authtoken.token',)
+
+    def db_for_read(self, model, **hints):
+        alias = read_alias.get()
+        if (alias is None
+                or model._meta.label_lower in self.primary_models
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema by replication.
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    """Choose the replica of the request for ReplicaRouter, and pin the
+    client to the primary after an unsafe request. Does nothing without
+    replicas. Works with both sync and async handlers."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Mark the instance as a coroutine function, as
+            # django.utils.deprecation.MiddlewareMixin does.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        token = read_alias.set(choose_replica(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            read_alias.reset(token)
+        if request.method not in SAFE_METHODS:
+            cache.set(get_pin_key(request), True,
+                      settings.DATABASE_PIN_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return await self.get_response(request)
+        # Connections belong to threads: check the replica in the one the
+        # async ORM of this request runs in.
+        token = read_alias.set(await sync_to_async(choose_replica)(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            read_alias.reset(token)
+        if request.method not in SAFE_METHODS:
+            await cache.aset(get_pin_key(request), True,
+                             settings.DATABASE_PIN_SECONDS)
+        return response
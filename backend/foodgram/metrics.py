@@ -0,0 +1,279 @@
+import asyncio
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from ipaddress import ip_address, ip_network
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 20, 50, 100)
+
+REQUESTS = 'foodgram_http_requests_total'
+LATENCY = 'foodgram_http_request_duration_seconds'
+QUERIES = 'foodgram_db_queries_per_request'
+DB_TIME = 'foodgram_db_duration_seconds_total'
+CACHE = 'foodgram_cache_requests_total'
+CACHE_RATIO = 'foodgram_cache_hit_ratio'
+
+METRICS = {
+    REQUESTS: ('counter', 'Число запросов по представлениям.'),
+    LATENCY: ('histogram', 'Время обработки запроса, секунды.'),
+    QUERIES: ('histogram', 'Число SQL-запросов на один запрос.'),
+    DB_TIME: ('counter', 'Суммарное время SQL-запросов, секунды.'),
+    CACHE: ('counter', 'Обращения к кешу: попадания и промахи.'),
+    CACHE_RATIO: ('gauge', 'Доля попаданий в кеш.'),
+}
+BUCKETS = {LATENCY: LATENCY_BUCKETS, QUERIES: QUERY_BUCKETS}
+
+
+class Registry:
+    """Metrics of this process.
+
+    Updates only touch in-memory dicts. Every METRICS_FLUSH_INTERVAL
+    seconds the whole state is written to a file of its own in METRICS_DIR,
+    so every gunicorn worker has one file and the exposition endpoint sums
+    them. Files of finished processes are kept, so that counters never go
+    back; the directory is cleared on deploy, like any temporary directory.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.pid = os.getpid()
+        self.name = f'{self.pid}-{time.time_ns()}.json'
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.flushed = time.monotonic()
+
+    def check_fork(self):
+        """A forked child starts with the state of its parent: drop it."""
+        if self.pid != os.getpid():
+            self.reset()
+
+    def inc(self, name, value=1, **labels):
+        with self.lock:
+            self.check_fork()
+            self.counters[name, tuple(labels.items())] += value
+
+    def observe(self, name, value, **labels):
+        buckets = BUCKETS[name]
+        with self.lock:
+            self.check_fork()
+            key = name, tuple(labels.items())
+            if key not in self.histograms:
+                self.histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+            histogram = self.histograms[key]
+            histogram[bisect_left(buckets, value)] += 1
+            histogram[-1] += value
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': [[name, labels, value] for (name, labels), value
+                             in self.counters.items()],
+                'histograms': [[name, labels, list(histogram)]
+                               for (name, labels), histogram
+                               in self.histograms.items()],
+            }
+
+    def flush(self):
+        if not self.counters and not self.histograms:
+            return
+        directory = settings.METRICS_DIR
+        os.makedirs(directory, exist_ok=True)
+        # One flush at a time per process, each through a temporary file of
+        # its own, so that the file is always replaced whole.
+        with self.flush_lock:
+            self.flushed = time.monotonic()
+            fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=directory)
+            try:
+                with open(fd, 'w', encoding='utf-8') as file:
+                    json.dump(self.snapshot(), file)
+                os.replace(temp_path, os.path.join(directory, self.name))
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+
+    def safe_flush(self):
+        """flush() for the request path and the exit: failures are logged,
+        never raised."""
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Could not write metrics to %s',
+                             settings.METRICS_DIR)
+
+    def maybe_flush(self):
+        if time.monotonic() - self.flushed >= settings.METRICS_FLUSH_INTERVAL:
+            self.safe_flush()
+
+
+registry = Registry()
+atexit.register(registry.safe_flush)
+
+
+def cache_result(cache, hit):
+    """Count a hit or a miss of the named cache."""
+    registry.inc(CACHE, cache=cache, result='hit' if hit else 'miss')
+
+
+def collect():
+    """Sum the files of all processes; return (counters, histograms) keyed
+    by (name, labels)."""
+    registry.flush()
+    counters, histograms = defaultdict(float), {}
+    directory = settings.METRICS_DIR
+    names = os.listdir(directory) if os.path.isdir(directory) else ()
+    for name in names:
+        if not name.endswith('.json'):
+            continue
+        with open(os.path.join(directory, name), encoding='utf-8') as file:
+            data = json.load(file)
+        for metric, labels, value in data['counters']:
+            counters[metric, tuple(map(tuple, labels))] += value
+        for metric, labels, values in data['histograms']:
+            key = metric, tuple(map(tuple, labels))
+            if key in histograms:
+                values = [a + b for a, b in zip(histograms[key], values)]
+            histograms[key] = values
+    return counters, histograms
+
+
+def get_cache_ratios(counters):
+    totals = defaultdict(lambda: [0, 0])
+    for (metric, labels), value in counters.items():
+        if metric == CACHE:
+            labels = dict(labels)
+            totals[labels['cache']][labels['result'] == 'hit'] += value
+    return {(CACHE_RATIO, (('cache', cache),)): hits / (hits + misses)
+            for cache, (misses, hits) in totals.items()}
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace(
+        '"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(
+        f'{key}="{escape(value)}"' for key, value in labels) + '}'
+
+
+def format_histogram(metric, labels, values):
+    lines, cumulative = [], 0
+    for bound, count in zip((*BUCKETS[metric], '+Inf'), values):
+        cumulative += count
+        lines.append(f'{metric}_bucket'
+                     f'{format_labels((*labels, ("le", bound)))} '
+                     f'{cumulative}')
+    lines.append(f'{metric}_sum{format_labels(labels)} {values[-1]}')
+    lines.append(f'{metric}_count{format_labels(labels)} {cumulative}')
+    return lines
+
+
+def render(counters, histograms):
+    """Prometheus text exposition format."""
+    series = defaultdict(list)
+    for (metric, labels), value in sorted({
+        **counters, **get_cache_ratios(counters)
+    }.items()):
+        series[metric].append(f'{metric}{format_labels(labels)} {value}')
+    for (metric, labels), values in sorted(histograms.items()):
+        series[metric].extend(format_histogram(metric, labels, values))
+    lines = []
+    for metric, (kind, description) in METRICS.items():
+        if series[metric]:
+            lines.append(f'# HELP {metric} {description}')
+            lines.append(f'# TYPE {metric} {kind}')
+            lines.extend(series[metric])
+    return '\n'.join(lines) + '\n'
+
+
+def is_allowed(address):
+    try:
+        address = ip_address(address)
+    except ValueError:
+        return False
+    return any(address in ip_network(network)
+               for network in settings.METRICS_ALLOWED_NETWORKS)
+
+
+def metrics_view(request):
+    """Metrics of all worker processes; open to METRICS_ALLOWED_NETWORKS
+    only."""
+    if not is_allowed(request.META.get('REMOTE_ADDR', '')):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        render(*collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def get_view_label(request):
+    """ViewSet.action for DRF viewsets, the URL name for other views."""
+    match = request.resolver_match
+    if match is None:
+        return 'unmatched'
+    cls = getattr(match.func, 'cls', None)
+    if cls is None:
+        return match.view_name
+    actions = getattr(match.func, 'actions', None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f'{cls.__name__}.{action}'
+
+
+class MetricsMiddleware:
+    """Request counters, latency and SQL query histograms per view. Query
+    figures come from ProfilingMiddleware, when it is installed. Works with
+    both sync and async handlers."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Mark the instance as a coroutine function, as
+            # django.utils.deprecation.MiddlewareMixin does.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - started)
+        return response
+
+    @staticmethod
+    def record(request, response, elapsed):
+        view = get_view_label(request)
+        registry.inc(REQUESTS, view=view, method=request.method,
+                     status=str(response.status_code))
+        registry.observe(LATENCY, elapsed, view=view)
+        profile = getattr(request, 'profile', None)
+        if profile is not None:
+            registry.observe(QUERIES, len(profile.queries), view=view)
+            registry.inc(DB_TIME, profile.sql_time, view=view)
+        registry.maybe_flush()
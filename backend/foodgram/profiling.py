@@ -0,0 +1,211 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from foodgram import fastjson
+from rest_framework import renderers
+
+logger = logging.getLogger(__name__)
+
+current_profile = ContextVar('current_profile', default=None)
+
+
+class Profile:
+    """Timings of one request: SQL statements and named sections."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []
+        self.timers = {}
+        self.active = set()
+
+    def execute(self, execute, sql, params, many, context):
+        """Run and record a statement; called by record_query."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(
+                (context['connection'].alias, sql,
+                 time.perf_counter() - started))
+
+    @property
+    def sql_time(self):
+        return sum(duration for _, _, duration in self.queries)
+
+
+@contextmanager
+def timed(name):
+    """Add the time spent in the block to the named section of the current
+    request. Nested blocks of the same section are counted once, so
+    recursive calls do not inflate it. Does nothing outside a request."""
+    profile = current_profile.get()
+    if profile is None or name in profile.active:
+        yield
+        return
+    profile.active.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.active.discard(name)
+        profile.timers[name] = (profile.timers.get(name, 0)
+                                + time.perf_counter() - started)
+
+
+class TimedRendererMixin:
+    def render(self, *args, **kwargs):
+        with timed('render'):
+            return super().render(*args, **kwargs)
+
+
+class TimedSerializerMixin:
+    """Times to_representation under serializer.<class name>. The time of
+    a nested serializer is also included in its parent's."""
+
+    def to_representation(self, instance):
+        with timed(f'serializer.{type(self).__name__}'):
+            return super().to_representation(instance)
+
+
+class TimedAuthenticationMixin:
+    def authenticate(self, request):
+        with timed('auth'):
+            return super().authenticate(request)
+
+    async def aauthenticate(self, request):
+        with timed('auth'):
+            return await super().aauthenticate(request)
+
+
+class JSONRenderer(TimedRendererMixin, fastjson.JSONRenderer):
+    pass
+
+
+class BrowsableAPIRenderer(TimedRendererMixin,
+                           renderers.BrowsableAPIRenderer):
+    pass
+
+
+def milliseconds(seconds):
+    return round(seconds * 1000, 2)
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper of every connection: pass the statement to the
+    profile of the current request, if any."""
+    profile = current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile.execute(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    # Installed once per connection object and kept for its lifetime, so
+    # it also sees the statements of async views, which run in other
+    # threads, with connections of their own. First in the list, so the
+    # temporary wrappers pushed and popped around it are left alone.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+class ProfilingMiddleware:
+    """Measure every request: SQL statements and their time on all
+    databases, rendering, authentication, serializers, and the view itself
+    (everything else below this middleware).
+
+    The totals go to the Server-Timing header. A PROFILING_SAMPLE_RATE share
+    of requests is also logged as a JSON line; requests slower than
+    PROFILING_SLOW_MS are always logged, as warnings with the full list of
+    SQL statements. SQL executed while a streaming response is consumed is
+    not seen. Works with both sync and async handlers.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Mark the instance as a coroutine function, as
+            # django.utils.deprecation.MiddlewareMixin does.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        for connection in connections.all():
+            install_query_recorder(None, connection)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        request.profile = profile = Profile()
+        token = current_profile.set(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        return self.finish(request, response, profile)
+
+    async def __acall__(self, request):
+        request.profile = profile = Profile()
+        token = current_profile.set(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        return self.finish(request, response, profile)
+
+    def finish(self, request, response, profile):
+        total = time.perf_counter() - profile.started
+        timings = self.get_timings(profile, total)
+        response['Server-Timing'] = self.server_timing(profile, timings)
+        slow = timings['total'] >= settings.PROFILING_SLOW_MS
+        if slow or random.random() < settings.PROFILING_SAMPLE_RATE:
+            self.log(request, response, profile, timings, slow)
+        return response
+
+    @staticmethod
+    def get_timings(profile, total):
+        sections = {name: milliseconds(duration)
+                    for name, duration in sorted(profile.timers.items())}
+        render = profile.timers.get('render', 0)
+        return {
+            'total': milliseconds(total),
+            'view': milliseconds(total - render),
+            'db': milliseconds(profile.sql_time),
+            **sections,
+        }
+
+    @staticmethod
+    def server_timing(profile, timings):
+        metrics = [f'{name};dur={duration}'
+                   for name, duration in timings.items()]
+        metrics[list(timings).index('db')] += (
+            f';desc="{len(profile.queries)} queries"')
+        return ', '.join(metrics)
+
+    @staticmethod
+    def log(request, response, profile, timings, slow):
+        match = request.resolver_match
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'queries': len(profile.queries),
+            'timings': timings,
+        }
+        if slow:
+            record['sql'] = [
+                {'db': alias, 'sql': sql, 'ms': milliseconds(duration)}
+                for alias, sql, duration in profile.queries
+            ]
+        logger.log(logging.WARNING if slow else logging.INFO,
+                   json.dumps(record, ensure_ascii=False))
@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 from dotenv import load_dotenv
 
@@ -28,9 +29,13 @@ INSTALLED_APPS = [
     'users',
     'recipes',
     'api',
+    'tasks',
 ]
 
 MIDDLEWARE = [
+    'foodgram.metrics.MetricsMiddleware',
+    'foodgram.profiling.ProfilingMiddleware',
+    'foodgram.db_routers.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -67,10 +72,76 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', default='test'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', default='test'),
         'HOST': os.getenv('DB_HOST', default='localhost'),
-        'PORT': os.getenv('DB_PORT', default='5432')
+        'PORT': os.getenv('DB_PORT', default='5432'),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', default=60)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Read replicas, separated by spaces: PostgreSQL hosts (host or host:port)
+# or, with SQLite, database files. Reads of GET and HEAD requests go to them,
+# see foodgram/db_routers.py.
+DATABASE_REPLICAS = []
+for number, replica in enumerate(os.getenv('DB_REPLICAS', default='').split(), 1):
+    if DATABASES['default']['ENGINE'].endswith('sqlite3'):
+        location = {'NAME': replica}
+    else:
+        host, _, port = replica.partition(':')
+        location = {'HOST': host, 'PORT': port or DATABASES['default']['PORT']}
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'], **location, 'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['foodgram.db_routers.ReplicaRouter']
+
+# Reads of a client go to the primary for this long after it writes.
+DATABASE_PIN_SECONDS = int(os.getenv('DB_PIN_SECONDS', default=10))
+
+# Longest pause before retrying a replica that failed to connect.
+DATABASE_REPLICA_BACKOFF = 60
+
+# Data versions live in the default cache, so it must be shared by every
+# process: gunicorn workers, the task worker and management commands.
+# infra/docker-compose.yml uses redis; the local memory default is only fit
+# for a single process, see recipes/checks.py.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram'),
+    },
+    # Anonymous recipe responses. Keys are versioned, so stale entries are
+    # only evicted: the local memory backend drops the least recently used.
+    'responses': {
+        'BACKEND': os.getenv(
+            'RESPONSE_CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv(
+            'RESPONSE_CACHE_LOCATION', default='foodgram-responses'
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', default=1000)),
+        },
+    },
+    # Viewer-independent recipe bodies, keyed by recipe and its changed time.
+    'fragments': {
+        'BACKEND': os.getenv(
+            'FRAGMENT_CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv(
+            'FRAGMENT_CACHE_LOCATION', default='foodgram-fragments'
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('FRAGMENT_CACHE_MAX_ENTRIES', default=10000)),
+        },
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -112,12 +183,99 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
+    ],
+    # The JSON renderer and parser run on orjson when it is installed.
+    'DEFAULT_RENDERER_CLASSES': [
+        'foodgram.profiling.JSONRenderer',
+        'foodgram.profiling.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'foodgram.fastjson.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 5,
 }
 
+REFERENCE_CACHE_TIMEOUT = 60 * 60 * 24
+
+KEYSET_COUNT_TIMEOUT = 60
+
+RESPONSE_CACHE_TIMEOUT = 60 * 60
+
+# Serve the read endpoints with async views; foodgram/asgi.py turns it on.
+ASYNC_READ_API = os.getenv('ASYNC_READ_API', default='False') == 'True'
+
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Tokens with their users are kept for TOKEN_CACHE_TIMEOUT seconds, in every
+# process and in the TOKEN_SHARED_CACHE cache alias, if set: as long as
+# another process may accept a deleted token or an inactive user.
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', default=1000))
+
+TOKEN_CACHE_TIMEOUT = int(os.getenv('TOKEN_CACHE_TIMEOUT', default=30))
+
+TOKEN_SHARED_CACHE = os.getenv('TOKEN_SHARED_CACHE', default='')
+
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', default=20))
+
+RECIPE_IMAGE_WIDTHS = (320, 640, 960)
+
+TASKS_EAGER = os.getenv('TASKS_EAGER', default='False') == 'True'
+
+TASKS_LEASE = 10 * 60
+
+TASKS_RETRY_DELAY = 10
+
+# Files of shopping lists exported in the background are deleted after
+# this many seconds.
+SHOPPING_LIST_EXPORT_TTL = int(os.getenv('SHOPPING_LIST_EXPORT_TTL', default=24 * 60 * 60))
+
+SHOPPING_LIST_RENDERERS = [
+    'api.exports.TextRenderer',
+    'api.exports.CsvRenderer',
+    'api.exports.PdfRenderer',
+]
+
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', default=0.01))
+
+PROFILING_SLOW_MS = int(os.getenv('PROFILING_SLOW_MS', default=500))
+
+METRICS_DIR = os.getenv(
+    'METRICS_DIR',
+    default=os.path.join(tempfile.gettempdir(), 'foodgram-metrics')
+)
+
+METRICS_FLUSH_INTERVAL = 10
+
+METRICS_ALLOWED_NETWORKS = os.getenv(
+    'METRICS_ALLOWED_NETWORKS',
+    default='127.0.0.0/8 10.0.0.0/8 172.16.0.0/12 192.168.0.0/16 ::1/128'
+).split(' ')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'foodgram.profiling': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
 }
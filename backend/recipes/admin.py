@@ -1,7 +1,9 @@
 from django.contrib import admin
 from django.utils.safestring import mark_safe
 
+from . import cart
 from .models import Ingredient, IngredientAmount, Recipe, Tag
+from .tasks import discard_image_variants, schedule_image_processing
 
 
 class IngredientAmountInline(admin.TabularInline):
@@ -17,13 +19,38 @@ class RecipeAdmin(admin.ModelAdmin):
     exclude = ('cart', 'favorite')
     inlines = (IngredientAmountInline,)
 
+    @staticmethod
+    def get_amounts(recipe):
+        return dict(IngredientAmount.objects.filter(
+            recipe=recipe).values_list('ingredient_id', 'amount'))
+
+    def save_model(self, request, obj, form, change):
+        if 'image' in form.changed_data:
+            discard_image_variants(obj)
+        super().save_model(request, obj, form, change)
+        if 'image' in form.changed_data:
+            schedule_image_processing(obj)
+
+    def save_related(self, request, form, formsets, change):
+        if not change:
+            super().save_related(request, form, formsets, change)
+            return
+        before = self.get_amounts(form.instance)
+        super().save_related(request, form, formsets, change)
+        after = self.get_amounts(form.instance)
+        cart.change_recipe(form.instance.pk, {
+            ingredient_id: after.get(ingredient_id, 0)
+            - before.get(ingredient_id, 0)
+            for ingredient_id in before.keys() | after.keys()
+        })
+
     @staticmethod
     def get_image(obj):
         return mark_safe(f'<img src={obj.image.url} width="80" height="30"')
 
     @staticmethod
     def amount_favorites(obj):
-        return obj.favorite.count()
+        return obj.favorites_count
 
     get_image.short_description = 'Изображение'
     amount_favorites.short_description = 'В избранном'
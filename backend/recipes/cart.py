@@ -0,0 +1,145 @@
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+
+from .models import IngredientAmount, Recipe, ShoppingCartIngredient
+
+
+def recipe_deltas(pairs, sign=1):
+    """Deltas for adding (sign=1) or removing (sign=-1) recipes from carts.
+
+    pairs is an iterable of (user_id, recipe_id).
+    """
+    users_by_recipe = defaultdict(list)
+    for user_id, recipe_id in pairs:
+        users_by_recipe[recipe_id].append(user_id)
+    deltas = defaultdict(int)
+    amounts = IngredientAmount.objects.filter(
+        recipe_id__in=users_by_recipe
+    ).values_list('recipe_id', 'ingredient_id', 'amount')
+    for recipe_id, ingredient_id, amount in amounts:
+        for user_id in users_by_recipe[recipe_id]:
+            deltas[user_id, ingredient_id] += sign * amount
+    return deltas
+
+
+@transaction.atomic
+def apply_deltas(deltas):
+    """Add deltas keyed by (user_id, ingredient_id) to the shopping cart
+    aggregate, dropping rows that reach zero."""
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    while deltas:
+        deltas = apply_deltas_once(deltas)
+
+
+def apply_deltas_once(deltas):
+    """Apply non-zero deltas; return those of the new rows that could not
+    be inserted.
+
+    select_for_update() only locks existing rows: a concurrent transaction
+    adding the same new (user, ingredient) rows inserts them first, and
+    ours fail the unique constraint. Their deltas are returned, to be
+    applied again as updates of the rows now locked.
+    """
+    user_ids = {user_id for user_id, _ in deltas}
+    ingredient_ids = {ingredient_id for _, ingredient_id in deltas}
+    rows = ShoppingCartIngredient.objects.select_for_update().filter(
+        user_id__in=user_ids, ingredient_id__in=ingredient_ids)
+    existing = {(row.user_id, row.ingredient_id): row for row in rows}
+    changed, removed, created = [], [], []
+    for (user_id, ingredient_id), delta in deltas.items():
+        row = existing.get((user_id, ingredient_id))
+        if row is None:
+            if delta > 0:
+                created.append(ShoppingCartIngredient(
+                    user_id=user_id, ingredient_id=ingredient_id,
+                    amount=delta))
+        elif row.amount + delta > 0:
+            row.amount += delta
+            changed.append(row)
+        else:
+            removed.append(row.pk)
+    ShoppingCartIngredient.objects.bulk_update(changed, ['amount'])
+    if removed:
+        ShoppingCartIngredient.objects.filter(pk__in=removed).delete()
+    if not created:
+        return {}
+    try:
+        with transaction.atomic():
+            ShoppingCartIngredient.objects.bulk_create(created)
+    except IntegrityError:
+        return {(row.user_id, row.ingredient_id): row.amount
+                for row in created}
+    return {}
+
+
+def add_recipes(pairs):
+    apply_deltas(recipe_deltas(pairs))
+
+
+def remove_recipes(pairs):
+    apply_deltas(recipe_deltas(pairs, sign=-1))
+
+
+def change_recipe(recipe_id, ingredient_deltas):
+    """Propagate ingredient amount changes of a recipe to the carts that
+    contain it. ingredient_deltas maps ingredient_id to amount delta."""
+    if not any(ingredient_deltas.values()):
+        return
+    user_ids = Recipe.cart.through.objects.filter(
+        recipe_id=recipe_id).values_list('user_id', flat=True)
+    apply_deltas({
+        (user_id, ingredient_id): delta
+        for user_id in user_ids
+        for ingredient_id, delta in ingredient_deltas.items()
+    })
+
+
+def expected_totals(user_ids=None):
+    """Aggregate computed from scratch: (user_id, ingredient_id, amount)."""
+    amounts = IngredientAmount.objects.filter(recipe__cart__isnull=False)
+    if user_ids is not None:
+        amounts = amounts.filter(recipe__cart__in=user_ids)
+    return amounts.values_list(
+        F('recipe__cart'), 'ingredient_id'
+    ).annotate(total=Sum('amount')).order_by()
+
+
+def find_inconsistencies(user_ids=None):
+    """Return (user_id, ingredient_id, expected, stored) of every row where
+    the materialized aggregate differs from the source tables."""
+    stored = ShoppingCartIngredient.objects.all()
+    if user_ids is not None:
+        stored = stored.filter(user_id__in=user_ids)
+    stored = {
+        (user_id, ingredient_id): amount
+        for user_id, ingredient_id, amount in stored.values_list(
+            'user_id', 'ingredient_id', 'amount').iterator()
+    }
+    problems = []
+    for user_id, ingredient_id, total in expected_totals(user_ids).iterator():
+        amount = stored.pop((user_id, ingredient_id), None)
+        if amount != total:
+            problems.append((user_id, ingredient_id, total, amount))
+    problems.extend(
+        (user_id, ingredient_id, None, amount)
+        for (user_id, ingredient_id), amount in stored.items()
+    )
+    return problems
+
+
+@transaction.atomic
+def rebuild(user_ids=None, batch_size=1000):
+    """Recompute the aggregate from the source tables."""
+    stored = ShoppingCartIngredient.objects.all()
+    if user_ids is not None:
+        stored = stored.filter(user_id__in=user_ids)
+    stored.delete()
+    ShoppingCartIngredient.objects.bulk_create(
+        (ShoppingCartIngredient(user_id=user_id, ingredient_id=ingredient_id,
+                                amount=total)
+         for user_id, ingredient_id, total
+         in expected_totals(user_ids).iterator()),
+        batch_size=batch_size
+    )
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core import checks
+
+# Cache backends whose data is seen by one process only.
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def is_process_local(alias='default'):
+    return settings.CACHES[alias]['BACKEND'] in PROCESS_LOCAL_CACHES
+
+
+@checks.register(checks.Tags.caches)
+def check_versions_cache(app_configs, **kwargs):
+    """Data versions live in the default cache: a version bumped by another
+    process (a management command, the task worker, another gunicorn
+    worker) is never seen by a process with its own copy."""
+    if not is_process_local():
+        return []
+    return [checks.Warning(
+        'The default cache is local to the process: data changes made by '
+        'other processes do not invalidate its cached responses.',
+        hint='Set CACHE_BACKEND and CACHE_LOCATION to a shared cache, '
+             'e.g. django.core.cache.backends.redis.RedisCache.',
+        id='recipes.W001',
+    )]
+
+
+@checks.register(checks.Tags.caches)
+def check_replica_pins(app_configs, **kwargs):
+    """Clients are pinned to the primary after a write by a key in the
+    default cache (foodgram.db_routers): their next request may be served
+    by another process."""
+    if not settings.DATABASE_REPLICAS or not is_process_local():
+        return []
+    return [checks.Warning(
+        'DB_REPLICAS is set but the default cache is local to the process: '
+        'after a write, a client may read a lagging replica without it.',
+        hint='Set CACHE_BACKEND and CACHE_LOCATION to a shared cache.',
+        id='recipes.W002',
+    )]
@@ -0,0 +1,75 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from foodgram.profiling import timed
+from PIL import Image
+
+VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+
+def variant_name(recipe_id, image_name, width, extension):
+    # Recipes may share an image file: each gets variants of its own.
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    return f'recipes/variants/{recipe_id}_{stem}_{width}.{extension}'
+
+
+def resize(image, width, image_format):
+    variant = image.copy()
+    variant.thumbnail((width, width * variant.height // variant.width),
+                      Image.LANCZOS)
+    if image_format != 'JPEG' or variant.mode == 'RGB':
+        return variant
+    variant = variant.convert('RGBA')
+    background = Image.new('RGB', variant.size, (255, 255, 255))
+    background.paste(variant, mask=variant.split()[-1])
+    return background
+
+
+def make_variants(recipe_id, image_name):
+    """Write resized copies of the image of a recipe in every variant
+    format and return {format: {width: storage name}}. Existing files are
+    never overwritten: the storage picks a free name."""
+    with default_storage.open(image_name) as original:
+        image = Image.open(original)
+        image.load()
+    widths = [
+        width for width in settings.RECIPE_IMAGE_WIDTHS if width < image.width
+    ] or [image.width]
+    variants = {}
+    for extension, (image_format, options) in VARIANT_FORMATS.items():
+        variants[extension] = {}
+        for width in widths:
+            buffer = BytesIO()
+            resize(image, width, image_format).save(
+                buffer, image_format, **options)
+            name = variant_name(recipe_id, image_name, width, extension)
+            variants[extension][str(width)] = default_storage.save(
+                name, ContentFile(buffer.getvalue()))
+    return variants
+
+
+def delete_variants(variants):
+    """Delete the files of image variants as returned by make_variants()."""
+    for names in (variants or {}).values():
+        for name in names.values():
+            default_storage.delete(name)
+
+
+def get_srcset(recipe, request=None, extension='webp'):
+    """srcset attribute value listing the ready variants of a recipe."""
+    variants = (recipe.image_variants or {}).get(extension, {})
+    candidates = []
+    with timed('images'):
+        for width, name in sorted(variants.items(),
+                                  key=lambda item: int(item[0])):
+            url = default_storage.url(name)
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            candidates.append(f'{url} {width}w')
+    return ', '.join(candidates)
@@ -0,0 +1,180 @@
+import csv
+import json
+import os
+import re
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from recipes.versions import bump_version
+
+DATA_ROOT = os.path.join(settings.BASE_DIR, 'data')
+FORMATS = ('csv', 'json', 'jsonl')
+CHUNK_SIZE = 64 * 1024
+SEPARATORS = re.compile(r'[\s,]*')
+
+
+def read_csv(file, fields):
+    for row in csv.reader(file):
+        if row:
+            yield dict(zip(fields, row))
+
+
+def read_jsonl(file, fields):
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_json(file, fields):
+    """Objects of a top-level JSON array, decoded one at a time so that
+    the whole file is never held in memory."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError('Ожидается JSON-массив объектов.')
+    position = 1
+    while True:
+        position = SEPARATORS.match(buffer, position).end()
+        if buffer.startswith(']', position):
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except ValueError:
+            chunk = file.read(CHUNK_SIZE)
+            if not chunk:
+                raise
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item
+
+
+READERS = {'csv': read_csv, 'json': read_json, 'jsonl': read_jsonl}
+
+
+class LoaderCommand(BaseCommand):
+    """Base of the catalog loaders.
+
+    Rows are read as a stream and written in batches: one SELECT per batch
+    finds the rows that already exist, then one bulk INSERT adds the new
+    ones (ON CONFLICT DO NOTHING) or, with --update, also overwrites the
+    changed ones (ON CONFLICT DO UPDATE). --dry-run only reports the
+    difference with the database.
+    """
+    model = None
+    default_file = None
+    fields = ()
+    unique_fields = ()
+    update_fields = ()
+    version_namespace = None
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            default=os.path.join(DATA_ROOT, self.default_file),
+            help='Файл с данными (по умолчанию %(default)s).')
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Формат файла; по умолчанию определяется по расширению.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Число строк в одном запросе к базе.')
+        parser.add_argument(
+            '--update', action='store_true',
+            help='Обновлять существующие записи, а не пропускать их.')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать отличия от базы, ничего не изменяя.')
+
+    def get_key(self, values):
+        return tuple(values[field] for field in self.unique_fields)
+
+    def clean(self, item):
+        try:
+            return {field: item[field] for field in self.fields}
+        except (KeyError, TypeError):
+            raise CommandError(f'Неверная запись: {item!r}')
+
+    def read(self, path, file_format):
+        file_format = file_format or os.path.splitext(path)[1][1:].lower()
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        try:
+            with open(path, encoding='utf-8-sig') as file:
+                for item in READERS[file_format](file, self.fields):
+                    yield self.clean(item)
+        except FileNotFoundError:
+            raise CommandError(f'Файл {path} не найден.')
+        except ValueError as error:
+            raise CommandError(f'Ошибка чтения {path}: {error}')
+
+    def batches(self, rows, batch_size):
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return
+            yield {self.get_key(values): values for values in batch}
+
+    def diff(self, batch):
+        """Split a batch into new rows and rows whose update_fields differ
+        from the stored ones."""
+        lookup = {
+            f'{field}__in': {values[field] for values in batch.values()}
+            for field in self.unique_fields
+        }
+        stored = {
+            self.get_key(values): values
+            for values in self.model.objects.filter(**lookup).values(
+                *self.unique_fields, *self.update_fields)
+        }
+        new, changed = [], []
+        for key, values in batch.items():
+            if key not in stored:
+                new.append(values)
+            elif any(values[field] != stored[key][field]
+                     for field in self.update_fields):
+                changed.append((stored[key], values))
+        return new, changed
+
+    def write(self, new, changed, update):
+        objs = [self.model(**values) for values in new]
+        if not update:
+            self.model.objects.bulk_create(objs, ignore_conflicts=True)
+            return
+        objs.extend(self.model(**values) for _, values in changed)
+        self.model.objects.bulk_create(
+            objs, update_conflicts=True, unique_fields=self.unique_fields,
+            update_fields=(*self.update_fields, 'changed'))
+
+    def report(self, new, changed):
+        for values in new:
+            self.stdout.write(f'+ {values}')
+        for before, after in changed:
+            self.stdout.write(f'~ {before} -> {after}')
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        update = options['update'] and bool(self.update_fields)
+        rows = self.read(options['path'], options['format'])
+        total = created = updated = 0
+        for batch in self.batches(rows, options['batch_size']):
+            new, changed = self.diff(batch)
+            if options['dry_run'] or options['verbosity'] > 1:
+                self.report(new, changed if update else ())
+            if not options['dry_run']:
+                self.write(new, changed, update)
+            total += len(batch)
+            created += len(new)
+            updated += len(changed) if update else 0
+            self.stdout.write(f'Обработано строк: {total}', ending='\r')
+        self.stdout.write('')
+        if not options['dry_run'] and (created or updated):
+            transaction.on_commit(lambda: bump_version(
+                self.version_namespace))
+        action = 'будет ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{self.model._meta.verbose_name_plural}: всего {total}, '
+            f'{action}добавлено {created}, {action}обновлено {updated}, '
+            f'без изменений {total - created - updated}.'))
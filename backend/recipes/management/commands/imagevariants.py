@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from recipes.models import Recipe
+from recipes.tasks import process_recipe_image
+
+
+class Command(BaseCommand):
+    help = ('Создает уменьшенные копии и WebP-варианты изображений '
+            'рецептов, у которых их еще нет (--all — у всех).')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересоздать варианты у всех рецептов.')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(image_variants={})
+        recipe_ids = list(recipes.values_list('id', flat=True))
+        for recipe_id in recipe_ids:
+            process_recipe_image(recipe_id)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {len(recipe_ids)}.'))
@@ -1,27 +1,14 @@
-import csv
-import os
-
-from django.conf import settings
-from django.core.management.base import BaseCommand, CommandError
 from recipes.models import Tag
+from recipes.versions import TAGS
 
-DATA_ROOT = os.path.join(settings.BASE_DIR, 'data')
+from ._loader import LoaderCommand
 
 
-class Command(BaseCommand):
-    def handle(self, *args, **options):
-        try:
-            with open(os.path.join(DATA_ROOT, 'tags.csv'),
-                      "r", encoding="utf-8") as csvfile:
-                reader = csv.reader(csvfile)
-                for row in reader:
-                    obj, created = Tag.objects.get_or_create(
-                        name=row[0],
-                        slug=row[2],
-                        defaults={'color': row[1]}
-                    )
-                    if not created:
-                        print(f'"Таг {row[0] = }" уже есть в БД {obj.pk = }')
-        except FileNotFoundError:
-            raise CommandError(f'Файл tags.csv не найден в директории '
-                               f'{DATA_ROOT = }')
+class Command(LoaderCommand):
+    help = 'Загружает теги из CSV (название, цвет, адрес), JSON или JSONL.'
+    model = Tag
+    default_file = 'tags.csv'
+    fields = ('name', 'color', 'slug')
+    unique_fields = ('slug',)
+    update_fields = ('name', 'color')
+    version_namespace = TAGS
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from recipes import cart
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает сводные списки покупок пользователей '
+            'или проверяет их согласованность (--check).')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только проверить, ничего не изменяя.')
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help='Ограничиться пользователем с данным id.')
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids']
+        if not options['check']:
+            cart.rebuild(user_ids)
+            self.stdout.write(
+                self.style.SUCCESS('Списки покупок пересчитаны.'))
+            return
+        problems = cart.find_inconsistencies(user_ids)
+        for user_id, ingredient_id, expected, stored in problems:
+            self.stdout.write(
+                f'Пользователь {user_id}, ингредиент {ingredient_id}: '
+                f'ожидается {expected}, сохранено {stored}')
+        if problems:
+            raise CommandError(
+                f'Найдено расхождений: {len(problems)}. '
+                f'Запустите команду без --check для пересчета.')
+        self.stdout.write(self.style.SUCCESS('Расхождений не найдено.'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes.models import Recipe
+from recipes.versions import POPULARITY, bump_version
+from users.counters import recount
+from users.models import User
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Recipe.favorite.through, 'recipe'),
+    (Recipe, 'cart_count', Recipe.cart.through, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'subscribers_count', User.subscribe.through, 'to_user'),
+)
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики рецептов и пользователей.'
+
+    def handle(self, *args, **options):
+        for model, field, related_model, related_field in COUNTERS:
+            updated = recount(model, field, related_model, related_field)
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}.{field}: '
+                f'обновлено строк {updated}')
+        transaction.on_commit(lambda: bump_version(POPULARITY))
+        self.stdout.write(self.style.SUCCESS('Счетчики пересчитаны.'))
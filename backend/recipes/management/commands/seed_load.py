@@ -0,0 +1,215 @@
+import math
+import random
+from io import BytesIO
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from PIL import Image
+from recipes import cart
+from recipes.models import Ingredient, IngredientAmount, Recipe, Tag
+from recipes.versions import AUTHORS, INGREDIENTS, RECIPES, TAGS, bump_version
+from users.models import User
+
+IMAGE_NAME = 'recipes/seed_load.png'
+UNITS = ('г', 'кг', 'мл', 'л', 'шт.', 'ст. л.', 'ч. л.', 'по вкусу')
+WORDS = ('нарезать', 'смешать', 'обжарить', 'варить', 'добавить', 'посолить',
+         'запечь', 'остудить', 'подавать', 'взбить', 'тушить', 'минут')
+
+
+def bump_versions():
+    for namespace in (TAGS, INGREDIENTS, RECIPES, AUTHORS):
+        bump_version(namespace)
+
+
+class Sampler:
+    """Weighted sampling over ids with a Zipf-like skew: the item at rank r
+    (in a shuffled order) is drawn with weight 1 / r ** exponent, so a few
+    items get most of the activity, as with real authors and recipes."""
+
+    def __init__(self, rng, ids, exponent):
+        self.rng = rng
+        self.ids = list(ids)
+        rng.shuffle(self.ids)
+        self.cum_weights = list(accumulate(
+            1 / (rank ** exponent) for rank in range(1, len(self.ids) + 1)))
+
+    def one(self):
+        return self.rng.choices(self.ids, cum_weights=self.cum_weights)[0]
+
+    def distinct(self, count, exclude=None):
+        """Up to count distinct ids, never exclude."""
+        count = min(count, len(self.ids) - (exclude is not None))
+        chosen = set()
+        for _ in range(10):
+            if len(chosen) >= count:
+                break
+            chosen.update(self.rng.choices(
+                self.ids, cum_weights=self.cum_weights,
+                k=2 * (count - len(chosen))))
+            chosen.discard(exclude)
+        return list(chosen)[:count]
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими данными для нагрузочного '
+            'тестирования: пользователи, рецепты, ингредиенты рецептов, '
+            'теги, избранное, списки покупок и подписки. Активность '
+            'распределена неравномерно, результат воспроизводим при '
+            'одинаковом --seed.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument(
+            '--ingredients', type=int, default=2000,
+            help='Сколько ингредиентов создать, если справочник пуст.')
+        parser.add_argument('--tags', type=int, default=10,
+                            help='Минимальное число тегов.')
+        parser.add_argument('--ingredients-per-recipe', type=float,
+                            default=8)
+        parser.add_argument('--favorites-per-user', type=float, default=20)
+        parser.add_argument('--cart-per-user', type=float, default=3)
+        parser.add_argument('--subscriptions-per-user', type=float,
+                            default=10)
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='Показатель степени распределения Ципфа.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def lognormal(self, mean, limit):
+        """Heavy-tailed count with the given mean, capped at limit."""
+        sigma = 1.0
+        mu = math.log(mean) - sigma ** 2 / 2 if mean > 0 else -math.inf
+        return min(limit, int(self.rng.lognormvariate(mu, sigma)))
+
+    def insert(self, model, objs):
+        """bulk_create objs in batches without holding them all in memory."""
+        total = 0
+        while True:
+            batch = list(islice(objs, self.batch_size))
+            if not batch:
+                break
+            model.objects.bulk_create(batch)
+            total += len(batch)
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: {total}', ending='\r')
+        self.stdout.write(f'{model._meta.verbose_name_plural}: {total}')
+        return total
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.prefix = f'load{options["seed"]}_'
+        if User.objects.filter(username__startswith=self.prefix).exists():
+            raise CommandError(
+                f'Данные с --seed {options["seed"]} уже загружены.')
+        tag_ids = self.create_tags(options['tags'])
+        ingredient_ids = self.create_ingredients(options['ingredients'])
+        user_ids = self.create_users(options['users'])
+        recipe_ids = self.create_recipes(options['recipes'], user_ids,
+                                         options['skew'])
+        recipes = Sampler(self.rng, recipe_ids, options['skew'])
+        self.create_recipe_relations(recipe_ids, tag_ids, ingredient_ids,
+                                     options)
+        self.create_user_relations(user_ids, recipes, options)
+        call_command('recount', stdout=self.stdout)
+        cart.rebuild(batch_size=self.batch_size)
+        transaction.on_commit(bump_versions)
+        self.stdout.write(self.style.SUCCESS('Данные загружены.'))
+
+    def create_tags(self, count):
+        existing = Tag.objects.count()
+        self.insert(Tag, (
+            Tag(name=f'{self.prefix}тег {number}',
+                slug=f'{self.prefix}tag{number}',
+                color=f'#{self.rng.randrange(0x1000000):06x}')
+            for number in range(existing, count)
+        ))
+        return list(Tag.objects.order_by('id').values_list('id', flat=True))
+
+    def create_ingredients(self, count):
+        if not Ingredient.objects.exists():
+            self.insert(Ingredient, (
+                Ingredient(name=f'ингредиент {number}',
+                           measurement_unit=self.rng.choice(UNITS))
+                for number in range(count)
+            ))
+        return list(Ingredient.objects.order_by('id').values_list(
+            'id', flat=True))
+
+    def create_users(self, count):
+        password = make_password(self.prefix)
+        self.insert(User, (
+            User(username=f'{self.prefix}{number}',
+                 email=f'{self.prefix}{number}@example.com',
+                 first_name='Пользователь', last_name=str(number),
+                 password=password)
+            for number in range(count)
+        ))
+        return list(User.objects.filter(
+            username__startswith=self.prefix).order_by('id').values_list(
+            'id', flat=True))
+
+    def create_recipes(self, count, user_ids, skew):
+        image = BytesIO()
+        Image.new('RGB', (64, 64), (230, 120, 40)).save(image, 'PNG')
+        if not default_storage.exists(IMAGE_NAME):
+            default_storage.save(IMAGE_NAME, ContentFile(image.getvalue()))
+        authors = Sampler(self.rng, user_ids, skew)
+        self.insert(Recipe, (
+            Recipe(author_id=authors.one(),
+                   name=f'{self.prefix}рецепт {number}',
+                   text=' '.join(self.rng.choices(WORDS, k=20)),
+                   image=IMAGE_NAME,
+                   cooking_time=self.rng.randint(5, 180))
+            for number in range(count)
+        ))
+        return list(Recipe.objects.filter(
+            name__startswith=self.prefix).order_by('id').values_list(
+            'id', flat=True))
+
+    def create_recipe_relations(self, recipe_ids, tag_ids, ingredient_ids,
+                                options):
+        tags = Sampler(self.rng, tag_ids, options['skew'])
+        ingredients = Sampler(self.rng, ingredient_ids, options['skew'])
+        self.insert(Recipe.tags.through, (
+            Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in tags.distinct(self.rng.randint(1, 3))
+        ))
+        self.insert(IngredientAmount, (
+            IngredientAmount(recipe_id=recipe_id, ingredient_id=ingredient_id,
+                             amount=self.rng.randint(1, 500))
+            for recipe_id in recipe_ids
+            for ingredient_id in ingredients.distinct(max(1, self.lognormal(
+                options['ingredients_per_recipe'], 30)))
+        ))
+
+    def create_user_relations(self, user_ids, recipes, options):
+        authors = Sampler(self.rng, Recipe.objects.filter(
+            name__startswith=self.prefix).values_list(
+            'author_id', flat=True).distinct().order_by('author_id'),
+            options['skew'])
+        for through, mean, limit in (
+            (Recipe.favorite.through, options['favorites_per_user'], 200),
+            (Recipe.cart.through, options['cart_per_user'], 30),
+        ):
+            self.insert(through, (
+                through(user_id=user_id, recipe_id=recipe_id)
+                for user_id in user_ids
+                for recipe_id in recipes.distinct(
+                    self.lognormal(mean, limit))
+            ))
+        self.insert(User.subscribe.through, (
+            User.subscribe.through(from_user_id=user_id, to_user_id=author_id)
+            for user_id in user_ids
+            for author_id in authors.distinct(
+                self.lognormal(options['subscriptions_per_user'], 200),
+                exclude=user_id)
+        ))
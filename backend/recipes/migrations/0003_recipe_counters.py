@@ -0,0 +1,44 @@
+# Generated by Django 4.1 on 2026-10-18 05:31
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def recount(model, field, related_model, related_field):
+    counts = related_model.objects.filter(
+        **{related_field: OuterRef('pk')}
+    ).order_by().values(related_field).annotate(
+        count=Count('pk')).values('count')
+    model.objects.update(**{field: Coalesce(Subquery(counts), 0)})
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    User = apps.get_model('users', 'User')
+    recount(Recipe, 'favorites_count', Recipe.favorite.through, 'recipe')
+    recount(Recipe, 'cart_count', Recipe.cart.through, 'recipe')
+    recount(User, 'recipes_count', Recipe, 'author')
+    recount(User, 'subscribers_count', User.subscribe.through, 'to_user')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_shoppingcartingredient'),
+        ('users', '0003_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='cart_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Количество пользователей, у кого рецепт в списке покупок', verbose_name='В списках покупок'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Количество пользователей, у кого рецепт в избранном', verbose_name='В избранном'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -89,6 +89,12 @@ class Recipe(CreatedChangedModel):
         verbose_name='Изображение',
         upload_to='recipes/',
     )
+    image_variants = models.JSONField(
+        verbose_name='Варианты изображения',
+        default=dict,
+        blank=True,
+        editable=False,
+    )
     cooking_time = models.PositiveSmallIntegerField(
         verbose_name='Время приготовления',
         help_text='Время приготовления рецепта в минутах',
@@ -131,6 +137,18 @@ class Recipe(CreatedChangedModel):
         help_text='Список пользователей, у кого рецепт в списке покупок',
         related_name='user_cart',
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        help_text='Количество пользователей, у кого рецепт в избранном',
+        default=0,
+        editable=False,
+    )
+    cart_count = models.PositiveIntegerField(
+        verbose_name='В списках покупок',
+        help_text='Количество пользователей, у кого рецепт в списке покупок',
+        default=0,
+        editable=False,
+    )
 
     def __str__(self):
         return f'{self.name} от автора {self.author.get_full_name()}'
@@ -140,6 +158,16 @@ class Recipe(CreatedChangedModel):
         verbose_name_plural = 'Рецепты'
         ordering = ['-created']
         unique_together = ['name', 'author']
+        indexes = [
+            models.Index(fields=('-created', '-id'),
+                         name='recipe_created_idx'),
+            models.Index(fields=('author', '-created', '-id'),
+                         name='recipe_author_created_idx'),
+            models.Index(fields=('favorites_count',),
+                         name='recipe_favorites_count_idx'),
+            models.Index(fields=('cart_count',),
+                         name='recipe_cart_count_idx'),
+        ]
 
 
 class IngredientAmount(models.Model):
@@ -173,3 +201,35 @@ class IngredientAmount(models.Model):
         verbose_name_plural = 'Ингредиенты в рецепте'
         ordering = ['recipe']
         unique_together = ['ingredient', 'recipe']
+
+
+class ShoppingCartIngredient(models.Model):
+    """Total amount of an ingredient over all recipes in a user's cart.
+
+    Maintained incrementally by recipes.cart, rebuilt by the
+    rebuildcarts management command.
+    """
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        related_name='cart_ingredients',
+        on_delete=models.CASCADE,
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        verbose_name='Ингредиент',
+        on_delete=models.CASCADE,
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='Количество',
+        help_text='Суммарное количество ингредиента в списке покупок',
+    )
+
+    def __str__(self):
+        return (f'Ингредиент {self.ingredient.name} '
+                f'в списке покупок {self.user.username}')
+
+    class Meta:
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Ингредиенты в списке покупок'
+        unique_together = ['user', 'ingredient']
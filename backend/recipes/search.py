@@ -0,0 +1,95 @@
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Recipe
+
+TABLE = Recipe._meta.db_table
+FTS_TABLE = f'{TABLE}_fts'
+SEARCH_CONFIG = 'russian'
+
+# The index itself is created by migration 0005_recipe_search; the SQLite
+# triggers are restored by repair().
+SQLITE_TRIGGERS = (
+    f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert
+    AFTER INSERT ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete
+    AFTER DELETE ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update
+    AFTER UPDATE OF name, text ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+        INSERT INTO {FTS_TABLE} (rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END''',
+)
+SQLITE_REBUILD = f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')"
+
+
+def repair(connection):
+    """Restore the SQLite triggers, which are lost when a migration rebuilds
+    the recipes table, and reindex the recipes written meanwhile."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'table' "
+            "AND name = %s", [FTS_TABLE])
+        if not cursor.fetchone()[0]:
+            return
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' "
+            "AND tbl_name = %s", [TABLE])
+        if cursor.fetchone()[0] == len(SQLITE_TRIGGERS):
+            return
+        for statement in (*SQLITE_TRIGGERS, SQLITE_REBUILD):
+            cursor.execute(statement)
+
+
+def fts_query(query):
+    """FTS5 query matching every word of the user query as a prefix, which
+    stands in for stemming on SQLite."""
+    words = re.findall(r'\w+', query)
+    return ' AND '.join(f'"{word}"*' for word in words)
+
+
+def search(queryset, query):
+    """Recipes of queryset matching query, annotated with rank (higher is
+    better)."""
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        tsquery = f"websearch_to_tsquery('{SEARCH_CONFIG}', %s)"
+        return queryset.filter(RawSQL(
+            f'{TABLE}.search_vector @@ {tsquery}', (query,),
+            output_field=BooleanField()
+        )).annotate(rank=RawSQL(
+            f'ts_rank_cd({TABLE}.search_vector, {tsquery})', (query,),
+            output_field=FloatField()
+        ))
+    if vendor == 'sqlite':
+        match = fts_query(query)
+        if not match:
+            return queryset.annotate(
+                rank=Value(0.0, output_field=FloatField())).none()
+        # A join rather than a correlated subquery: bm25() then reads the
+        # phrase statistics once per query instead of once per matched row.
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = {TABLE}.id',
+                   f'{FTS_TABLE} MATCH %s'],
+            params=[match],
+        ).annotate(rank=RawSQL(
+            f'-bm25({FTS_TABLE}, 10.0, 1.0)', (),
+            output_field=FloatField()
+        ))
+    return queryset.filter(
+        Q(name__icontains=query) | Q(text__icontains=query)
+    ).annotate(rank=Value(0.0, output_field=FloatField()))
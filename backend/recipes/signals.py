@@ -0,0 +1,161 @@
+from functools import partial
+
+from django.db import connections, transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_init,
+                                      post_migrate, post_save, pre_delete)
+from django.dispatch import receiver
+from users.counters import change_counters, count_pairs
+from users.models import User
+
+from . import cart, search
+from .images import delete_variants
+from .models import Ingredient, IngredientAmount, Recipe, Tag
+from .versions import (INGREDIENTS, POPULARITY, TAGS, bump_author_versions,
+                       bump_recipe_versions, bump_version)
+
+# Author fields shown in recipe responses.
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def bump_tags_version(**kwargs):
+    transaction.on_commit(partial(bump_version, TAGS))
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def bump_ingredients_version(**kwargs):
+    transaction.on_commit(partial(bump_version, INGREDIENTS))
+
+
+# Tag links are only changed together with their recipe, which is saved,
+# so there is no m2m_changed receiver: it would also cost adding tags its
+# fast path (an extra SELECT on every recipe write).
+@receiver((post_save, post_delete), sender=Recipe)
+def bump_recipe_version(instance, **kwargs):
+    transaction.on_commit(partial(bump_recipe_versions, instance.pk))
+
+
+@receiver((post_save, post_delete), sender=IngredientAmount)
+def bump_amount_recipe_version(instance, **kwargs):
+    transaction.on_commit(partial(bump_recipe_versions, instance.recipe_id))
+
+
+@receiver(post_init, sender=User)
+def remember_author_fields(instance, **kwargs):
+    # Deferred fields are left out: reading them would query the user.
+    instance._author_fields = {
+        field: instance.__dict__.get(field) for field in AUTHOR_FIELDS}
+
+
+def author_fields_changed(instance, update_fields):
+    fields = AUTHOR_FIELDS
+    if update_fields is not None:
+        fields = fields & set(update_fields)
+    return any(
+        field in instance.__dict__
+        and instance.__dict__[field] != instance._author_fields[field]
+        for field in fields
+    )
+
+
+@receiver(post_save, sender=User)
+def bump_author_version(instance, created, update_fields, **kwargs):
+    """Only a changed name or email of a user with recipes is shown in
+    cached recipes: signups, logins and password changes bump nothing."""
+    changed = not created and author_fields_changed(instance, update_fields)
+    remember_author_fields(instance)
+    if changed and instance.recipes.exists():
+        transaction.on_commit(partial(bump_author_versions, instance.pk))
+
+
+@receiver(post_migrate)
+def repair_search_index(sender, using, **kwargs):
+    if sender.name == 'recipes':
+        search.repair(connections[using])
+
+
+def get_pairs(through, instance, reverse, pk_set):
+    """Existing (user_id, recipe_id) rows of Recipe.favorite or Recipe.cart
+    touched by a change made through instance."""
+    if reverse:
+        filters = {'user_id': instance.pk}
+        if pk_set is not None:
+            filters['recipe_id__in'] = pk_set
+    else:
+        filters = {'recipe_id': instance.pk}
+        if pk_set is not None:
+            filters['user_id__in'] = pk_set
+    return list(through.objects.filter(**filters).values_list(
+        'user_id', 'recipe_id'))
+
+
+def get_changed_pairs(sender, instance, action, reverse, pk_set):
+    """Pairs added or removed by an m2m_changed action and the sign of the
+    change, or (None, 0) for the pre_* actions.
+
+    Rows about to be removed are looked up in pre_remove/pre_clear, because
+    pk_set of post_remove also lists pairs that did not exist.
+    """
+    attname = f'_removed_pairs_{sender._meta.db_table}'
+    if action in ('pre_remove', 'pre_clear'):
+        setattr(instance, attname,
+                get_pairs(sender, instance, reverse, pk_set))
+    elif action in ('post_remove', 'post_clear'):
+        return instance.__dict__.pop(attname), -1
+    if action == 'post_add':
+        if reverse:
+            return [(instance.pk, recipe_id) for recipe_id in pk_set], 1
+        return [(user_id, instance.pk) for user_id in pk_set], 1
+    return None, 0
+
+
+@receiver(m2m_changed, sender=Recipe.favorite.through)
+def update_favorites_count(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    pairs, sign = get_changed_pairs(sender, instance, action, reverse, pk_set)
+    if pairs:
+        change_counters(Recipe, 'favorites_count',
+                        count_pairs(pairs, 1, sign))
+        transaction.on_commit(partial(bump_version, POPULARITY))
+
+
+@receiver(m2m_changed, sender=Recipe.cart.through)
+def update_cart(sender, instance, action, reverse, pk_set, **kwargs):
+    pairs, sign = get_changed_pairs(sender, instance, action, reverse, pk_set)
+    if not pairs:
+        return
+    change_counters(Recipe, 'cart_count', count_pairs(pairs, 1, sign))
+    transaction.on_commit(partial(bump_version, POPULARITY))
+    if sign > 0:
+        cart.add_recipes(pairs)
+    else:
+        cart.remove_recipes(pairs)
+
+
+@receiver(post_save, sender=Recipe)
+def increase_recipes_count(instance, created, **kwargs):
+    if created:
+        change_counters(User, 'recipes_count', {instance.author_id: 1})
+
+
+@receiver(post_delete, sender=Recipe)
+def decrease_recipes_count(instance, **kwargs):
+    change_counters(User, 'recipes_count', {instance.author_id: -1})
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_image_variants(instance, **kwargs):
+    transaction.on_commit(partial(delete_variants, instance.image_variants))
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_deleted_recipe_from_carts(instance, **kwargs):
+    cart.remove_recipes(get_pairs(Recipe.cart.through, instance, False, None))
+
+
+@receiver(pre_delete, sender=User)
+def update_counters_of_deleted_user(instance, **kwargs):
+    for through, field in ((Recipe.favorite.through, 'favorites_count'),
+                           (Recipe.cart.through, 'cart_count')):
+        pairs = get_pairs(through, instance, True, None)
+        change_counters(Recipe, field, count_pairs(pairs, 1, sign=-1))
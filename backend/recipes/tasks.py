@@ -0,0 +1,44 @@
+from functools import partial
+
+from django.db import transaction
+from django.utils import timezone
+from tasks.queue import enqueue, task
+
+from .images import delete_variants, make_variants
+from .models import Recipe
+from .versions import bump_recipe_versions
+
+
+@task(name='recipes.process_recipe_image')
+def process_recipe_image(recipe_id):
+    """Build the variants of a recipe image and record them on the recipe
+    in place of the previous ones, unless the image was replaced in the
+    meantime."""
+    image_name, previous = Recipe.objects.filter(pk=recipe_id).values_list(
+        'image', 'image_variants').first() or (None, None)
+    if not image_name:
+        return None
+    variants = make_variants(recipe_id, image_name)
+    if not Recipe.objects.filter(pk=recipe_id, image=image_name).update(
+            image_variants=variants, changed=timezone.now()):
+        delete_variants(variants)
+        return None
+    delete_variants(previous)
+    bump_recipe_versions(recipe_id)
+    return variants
+
+
+def discard_image_variants(recipe):
+    """Reset the variants of a recipe whose image is being replaced. The
+    files of the old variants are deleted when the transaction commits."""
+    transaction.on_commit(partial(delete_variants, recipe.image_variants))
+    recipe.image_variants = {}
+
+
+def schedule_image_processing(recipe):
+    """Queue generation of the image variants of a recipe."""
+    return enqueue(
+        process_recipe_image,
+        idempotency_key=f'recipe-image:{recipe.pk}:{recipe.image.name}',
+        recipe_id=recipe.pk,
+    )
@@ -0,0 +1,80 @@
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from foodgram.metrics import cache_result
+
+TAGS = 'tags'
+INGREDIENTS = 'ingredients'
+RECIPES = 'recipes'
+AUTHORS = 'authors'
+POPULARITY = 'popularity'
+
+
+def recipe_namespace(recipe_id):
+    return f'recipe:{recipe_id}'
+
+
+def author_namespace(author_id):
+    return f'author:{author_id}'
+
+
+def _key(namespace):
+    return f'version:{namespace}'
+
+
+def _start(key):
+    # Start from the clock so a flushed cache never hands out old versions.
+    cache.add(key, int(time.time() * 1000), timeout=None)
+    return cache.get(key)
+
+
+def get_version(namespace):
+    """Return the current data version of namespace."""
+    key = _key(namespace)
+    version = cache.get(key)
+    cache_result('versions', version is not None)
+    if version is not None:
+        return version
+    return _start(key)
+
+
+def get_versions(namespaces):
+    """Current versions of several namespaces with one cache round trip."""
+    keys = {namespace: _key(namespace) for namespace in namespaces}
+    versions = cache.get_many(keys.values())
+    cache_result('versions', len(versions) == len(keys))
+    return [
+        versions[key] if key in versions else _start(key)
+        for key in keys.values()
+    ]
+
+
+# For async views. The cache backends of Django run their async methods in
+# a thread as well.
+aget_version = sync_to_async(get_version)
+aget_versions = sync_to_async(get_versions)
+
+
+def bump_version(namespace):
+    """Mark every cached representation of namespace as stale."""
+    key = _key(namespace)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        return _start(key)
+
+
+def bump_recipe_versions(*recipe_ids):
+    """Mark the cached lists of recipes and the details of recipe_ids as
+    stale."""
+    bump_version(RECIPES)
+    for recipe_id in recipe_ids:
+        bump_version(recipe_namespace(recipe_id))
+
+
+def bump_author_versions(author_id):
+    """Mark the cached recipe responses and the recipe bodies of the author
+    as stale."""
+    bump_version(AUTHORS)
+    bump_version(author_namespace(author_id))
@@ -0,0 +1,15 @@
+from django.contrib import admin
+
+from .models import Task
+
+
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'user', 'created',
+                    'changed')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'idempotency_key')
+    raw_id_fields = ('user',)
+    readonly_fields = ('attempts', 'result', 'error')
+
+
+admin.site.register(Task, TaskAdmin)
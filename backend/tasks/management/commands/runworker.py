@@ -0,0 +1,34 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from tasks import queue
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди в пуле потоков.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, default=4,
+            help='Число потоков-исполнителей.')
+        parser.add_argument(
+            '--sleep', type=float, default=1.0,
+            help='Пауза в секундах, когда очередь пуста.')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить доступные задачи и завершиться.')
+
+    def handle(self, *args, **options):
+        threads = options['threads']
+        self.stdout.write(f'Обработчик задач запущен, потоков: {threads}.')
+        with ThreadPoolExecutor(max_workers=threads,
+                                thread_name_prefix='tasks') as executor:
+            while True:
+                jobs = queue.claim(threads)
+                for job in executor.map(queue.run, jobs):
+                    self.stdout.write(f'{job}')
+                if not jobs:
+                    if options['once']:
+                        return
+                    time.sleep(options['sleep'])
@@ -0,0 +1,82 @@
+from django.db import models
+from django.utils import timezone
+from recipes.models import CreatedChangedModel
+from users.models import User
+
+
+class Task(CreatedChangedModel):
+    """Model Task. A unit of background work run by manage.py runworker."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'Ожидает'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+    name = models.CharField(
+        verbose_name='Задача',
+        help_text='Имя зарегистрированной функции',
+        max_length=200,
+    )
+    kwargs = models.JSONField(
+        verbose_name='Аргументы',
+        default=dict,
+    )
+    idempotency_key = models.CharField(
+        verbose_name='Ключ идемпотентности',
+        help_text='Повторная постановка с тем же ключом вернет ту же задачу',
+        max_length=255,
+        unique=True,
+        null=True,
+        blank=True,
+    )
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        related_name='tasks',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+    )
+    status = models.CharField(
+        verbose_name='Статус',
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField(
+        verbose_name='Попыток',
+        default=0,
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        verbose_name='Максимум попыток',
+        default=3,
+    )
+    run_after = models.DateTimeField(
+        verbose_name='Выполнить после',
+        help_text='Для выполняемой задачи - когда она считается зависшей',
+        default=timezone.now,
+    )
+    result = models.JSONField(
+        verbose_name='Результат',
+        null=True,
+        blank=True,
+    )
+    error = models.TextField(
+        verbose_name='Ошибка',
+        blank=True,
+    )
+
+    class Meta:
+        ordering = ['-created']
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+        indexes = [
+            models.Index(fields=('status', 'run_after')),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
@@ -0,0 +1,142 @@
+import traceback
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Task
+
+registry = {}
+
+
+def task(name=None, max_attempts=3):
+    """Register a function as a task. It is called with the keyword
+    arguments given to enqueue() and must return a JSON-serializable
+    result."""
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__name__}'
+        func.task_name = task_name
+        func.max_attempts = max_attempts
+        registry[task_name] = func
+        return func
+    return decorator
+
+
+def enqueue(func, idempotency_key=None, user=None, run_after=None,
+            **kwargs):
+    """Put a registered task on the queue and return its Task.
+
+    A task with the same idempotency_key is returned instead of creating a
+    new one. The task becomes visible to workers when the current
+    transaction commits, and is run from run_after on, if given; with
+    TASKS_EAGER a task due at once is run right then in the calling
+    thread.
+    """
+    values = {
+        'name': func.task_name,
+        'kwargs': kwargs,
+        'user': user,
+        'max_attempts': func.max_attempts,
+    }
+    if run_after is not None:
+        values['run_after'] = run_after
+    if idempotency_key is None:
+        job = Task.objects.create(**values)
+    else:
+        try:
+            with transaction.atomic():
+                job, created = Task.objects.get_or_create(
+                    idempotency_key=idempotency_key, defaults=values)
+        except IntegrityError:
+            return Task.objects.get(idempotency_key=idempotency_key)
+        if not created:
+            return job
+    if settings.TASKS_EAGER and run_after is None:
+        transaction.on_commit(partial(run_eagerly, job.pk))
+    return job
+
+
+def run_eagerly(task_id):
+    job = claim_one(task_id)
+    if job is not None:
+        run(job)
+
+
+def available(now=None):
+    """Pending tasks that are due, and running ones whose lease expired
+    with attempts left."""
+    now = now or timezone.now()
+    return Task.objects.filter(
+        Q(status=Task.PENDING)
+        | Q(status=Task.RUNNING, attempts__lt=F('max_attempts')),
+        run_after__lte=now,
+    )
+
+
+def fail_abandoned(now=None):
+    """Mark FAILED the running tasks whose lease expired on the last
+    attempt: the worker died running them (killed, out of memory), and
+    running them again would likely kill the next one."""
+    now = now or timezone.now()
+    return Task.objects.filter(
+        status=Task.RUNNING,
+        attempts__gte=F('max_attempts'),
+        run_after__lte=now,
+    ).update(
+        status=Task.FAILED,
+        error='The worker stopped while running the task.',
+        changed=now,
+    )
+
+
+def claim_one(task_id):
+    """Take the task for this worker. Claiming is a conditional UPDATE, so
+    concurrent workers never run the same task twice."""
+    now = timezone.now()
+    claimed = available(now).filter(pk=task_id).update(
+        status=Task.RUNNING,
+        attempts=F('attempts') + 1,
+        run_after=now + timedelta(seconds=settings.TASKS_LEASE),
+    )
+    if not claimed:
+        return None
+    return Task.objects.get(pk=task_id)
+
+
+def claim(limit):
+    """Claim up to limit due tasks, oldest first."""
+    fail_abandoned()
+    task_ids = available().order_by('run_after').values_list(
+        'id', flat=True)[:limit]
+    claimed = (claim_one(task_id) for task_id in list(task_ids))
+    return [job for job in claimed if job is not None]
+
+
+def run(job):
+    """Run a claimed task and record the outcome. Failed tasks are retried
+    with exponential backoff until max_attempts is reached."""
+    try:
+        func = registry.get(job.name)
+        if func is None:
+            raise LookupError(f'Task {job.name} is not registered')
+        result = func(**job.kwargs)
+    except Exception:
+        job.error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Task.PENDING
+            job.run_after = timezone.now() + timedelta(
+                seconds=settings.TASKS_RETRY_DELAY * 2 ** (job.attempts - 1))
+        else:
+            job.status = Task.FAILED
+        job.save(update_fields=('status', 'run_after', 'error', 'changed'))
+    else:
+        job.status = Task.DONE
+        job.result = result
+        job.error = ''
+        job.save(update_fields=('status', 'result', 'error', 'changed'))
+    finally:
+        close_old_connections()
+    return job
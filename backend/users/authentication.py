@@ -0,0 +1,161 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from foodgram.asyncviews import TokenAuthentication
+from foodgram.metrics import cache_result
+from foodgram.profiling import TimedAuthenticationMixin
+from rest_framework.authtoken.models import Token
+from users.models import User
+
+# User fields left out of the cache; they are loaded on access.
+SECRET_FIELDS = ('password',)
+
+
+def get_cache_key(key):
+    # Token keys are secrets: keep them out of the shared cache keys.
+    return f'token:{hashlib.sha1(key.encode()).hexdigest()}'
+
+
+def to_entry(token):
+    """Cacheable values of a token with its user."""
+    user = token.user
+    return {
+        'created': token.created,
+        'user': {
+            field.attname: getattr(user, field.attname)
+            for field in User._meta.concrete_fields
+            if field.attname not in SECRET_FIELDS
+        },
+    }
+
+
+def from_entry(key, entry):
+    """A token with its user built from to_entry() values, as if read from
+    the database: saving the user writes only the cached fields."""
+    user = User.from_db(DEFAULT_DB_ALIAS, list(entry['user']),
+                        list(entry['user'].values()))
+    token = Token.from_db(DEFAULT_DB_ALIAS, ['key', 'user_id', 'created'],
+                          [key, user.pk, entry['created']])
+    token.user = user
+    return token
+
+
+class TokenCache:
+    """Tokens with their users by key.
+
+    A bounded LRU of this process backed by the TOKEN_SHARED_CACHE cache,
+    if set. Entries live TOKEN_CACHE_TIMEOUT seconds in both: forget()
+    clears this process and the shared cache, other processes may still
+    accept a forgotten token until their entry expires. Entries hold plain
+    values, without the password hash, and every get() builds new objects.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        # Bumped by forget(): a token read from the database before that
+        # may be stale and is not stored.
+        self.generation = 0
+
+    @property
+    def shared(self):
+        alias = settings.TOKEN_SHARED_CACHE
+        return caches[alias] if alias else None
+
+    def get_local(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, entry = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def set_local(self, key, entry, generation):
+        with self.lock:
+            if generation != self.generation:
+                return False
+            self.entries[key] = (
+                time.monotonic() + settings.TOKEN_CACHE_TIMEOUT, entry)
+            self.entries.move_to_end(key)
+            while len(self.entries) > settings.TOKEN_CACHE_SIZE:
+                self.entries.popitem(last=False)
+            return True
+
+    def get(self, key):
+        entry = self.get_local(key)
+        if entry is None and self.shared is not None:
+            generation = self.generation
+            entry = self.shared.get(get_cache_key(key))
+            if entry is not None:
+                self.set_local(key, entry, generation)
+        cache_result('tokens', entry is not None)
+        return None if entry is None else from_entry(key, entry)
+
+    async def aget(self, key):
+        entry = self.get_local(key)
+        if entry is None and self.shared is not None:
+            generation = self.generation
+            entry = await self.shared.aget(get_cache_key(key))
+            if entry is not None:
+                self.set_local(key, entry, generation)
+        cache_result('tokens', entry is not None)
+        return None if entry is None else from_entry(key, entry)
+
+    def set(self, key, token, generation):
+        """Store a token read from the database when the generation was
+        taken, unless forget() ran since."""
+        entry = to_entry(token)
+        if self.set_local(key, entry, generation) and self.shared is not None:
+            self.shared.set(get_cache_key(key), entry,
+                            settings.TOKEN_CACHE_TIMEOUT)
+
+    async def aset(self, key, token, generation):
+        entry = to_entry(token)
+        if self.set_local(key, entry, generation) and self.shared is not None:
+            await self.shared.aset(get_cache_key(key), entry,
+                                   settings.TOKEN_CACHE_TIMEOUT)
+
+    def forget(self, keys):
+        keys = list(keys)
+        with self.lock:
+            self.generation += 1
+            for key in keys:
+                self.entries.pop(key, None)
+        if self.shared is not None and keys:
+            self.shared.delete_many([get_cache_key(key) for key in keys])
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TimedAuthenticationMixin,
+                                TokenAuthentication):
+    """TokenAuthentication served from token_cache, so an authenticated
+    request does not query the token and its user. Tokens are forgotten
+    when deleted (logout) and when their user is saved (password change,
+    deactivation), see users/signals.py."""
+
+    def authenticate_credentials(self, key):
+        token = token_cache.get(key)
+        if token is None:
+            generation = token_cache.generation
+            _, token = super().authenticate_credentials(key)
+            token_cache.set(key, token, generation)
+        return token.user, token
+
+    async def aauthenticate_credentials(self, key):
+        token = await token_cache.aget(key)
+        if token is None:
+            generation = token_cache.generation
+            _, token = await super().aauthenticate_credentials(key)
+            await token_cache.aset(key, token, generation)
+        return token.user, token
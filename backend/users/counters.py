@@ -0,0 +1,31 @@
+from collections import Counter
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def change_counters(model, field, deltas):
+    """Atomically add deltas ({pk: delta}) to the counter column field,
+    with one UPDATE per distinct delta value."""
+    pks_by_delta = {}
+    for pk, delta in deltas.items():
+        if delta:
+            pks_by_delta.setdefault(delta, []).append(pk)
+    for delta, pks in pks_by_delta.items():
+        model.objects.filter(pk__in=pks).update(**{field: F(field) + delta})
+
+
+def count_pairs(pairs, index, sign=1):
+    """Deltas per id found at position index of every pair."""
+    return {pk: sign * count
+            for pk, count in Counter(pair[index] for pair in pairs).items()}
+
+
+def recount(model, field, related_model, related_field):
+    """Recompute counter column field of every model row as the number of
+    related_model rows pointing to it through related_field."""
+    counts = related_model.objects.filter(
+        **{related_field: OuterRef('pk')}
+    ).order_by().values(related_field).annotate(
+        count=Count('pk')).values('count')
+    return model.objects.update(**{field: Coalesce(Subquery(counts), 0)})
@@ -37,11 +37,25 @@ class User(AbstractUser):
         related_name='subscribers',
         symmetrical=False,
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Количество рецептов',
+        default=0,
+        editable=False,
+    )
+    subscribers_count = models.PositiveIntegerField(
+        verbose_name='Количество подписчиков',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = "Пользователь"
         verbose_name_plural = "Пользователи"
         ordering = ["username"]
+        indexes = [
+            models.Index(fields=("-date_joined", "-id"),
+                         name="user_date_joined_idx"),
+        ]
 
     @property
     def is_admin(self):
@@ -1,6 +1,224 @@
+import hashlib
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import (EmptyResultSet, FieldDoesNotExist,
+                                    ValidationError)
+from django.core.paginator import InvalidPage, Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+from foodgram.metrics import cache_result
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def get_count(queryset):
+    """Total for keyset pages: the planner estimate for an unfiltered
+    PostgreSQL table, otherwise COUNT(*) cached for a short time."""
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql' and not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        if row and row[0] >= 0:
+            return row[0]
+    try:
+        sql = str(queryset.query)
+    except EmptyResultSet:
+        return 0
+    key = f'count:{hashlib.sha1(sql.encode()).hexdigest()}'
+    count = cache.get(key)
+    cache_result('counts', count is not None)
+    if count is None:
+        count = queryset.values('pk').count()
+        cache.set(key, count, settings.KEYSET_COUNT_TIMEOUT)
+    return count
+
+
+class CountPaginator(Paginator):
+    """Paginator that counts primary keys only, so the annotations of the
+    queryset are not computed for every row just to get the total."""
+
+    @cached_property
+    def count(self):
+        if isinstance(self.object_list, QuerySet):
+            return self.object_list.values('pk').count()
+        return super().count
 
 
 class PageLimitPagination(PageNumberPagination):
-    """PageNumberPagination with limit."""
+    """PageNumberPagination with limit.
+
+    Passing cursor (empty for the first page) switches to keyset
+    pagination: pages are read with WHERE on the ordering columns instead of
+    OFFSET, so deep pages cost as much as the first one. The ordering is the
+    one applied to the queryset, or the view's keyset_ordering, with the
+    primary key as the final tie-breaker. count is approximate in this mode.
+    """
+    django_paginator_class = CountPaginator
     page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    keyset_ordering = ('-pk',)
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+        return self.paginate_keyset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() for async views: the count and the rows are
+        read with the async ORM."""
+        self.keyset = self.cursor_query_param in request.query_params
+        if self.keyset:
+            return await self.apaginate_keyset(queryset, request, view)
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await queryset.values('pk').acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)))
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        self.request = request
+        self.page.object_list = [obj async for obj in self.page.object_list]
+        return list(self.page)
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.next_link),
+            ('previous', self.previous_link),
+            ('results', data)
+        ]))
+
+    def get_keyset_ordering(self, queryset, view):
+        ordering = [
+            field for field in queryset.query.order_by
+            if isinstance(field, str)
+        ]
+        if not ordering or len(ordering) != len(queryset.query.order_by):
+            ordering = list(getattr(view, 'keyset_ordering',
+                                    self.keyset_ordering))
+        if not {'pk', '-pk', 'id', '-id'} & set(ordering):
+            descending = ordering[-1].startswith('-')
+            ordering.append('-pk' if descending else 'pk')
+        return ordering
+
+    def paginate_keyset(self, queryset, request, view):
+        page = self.get_keyset_page(queryset, request, view)
+        self.count = get_count(queryset)
+        return self.get_keyset_rows(list(page))
+
+    async def apaginate_keyset(self, queryset, request, view):
+        page = self.get_keyset_page(queryset, request, view)
+        self.count = await sync_to_async(get_count)(queryset)
+        return self.get_keyset_rows([row async for row in page])
+
+    def get_keyset_page(self, queryset, request, view):
+        """Query of limit + 1 rows after the cursor position."""
+        self.request = request
+        self.limit = self.get_page_size(request)
+        self.ordering = self.get_keyset_ordering(queryset, view)
+        self.position, self.reverse = self.decode_cursor(
+            request, queryset.model)
+        ordering = self.ordering
+        if self.reverse:
+            ordering = [self.invert(field) for field in ordering]
+        queryset = queryset.order_by(*ordering)
+        if self.position is not None:
+            queryset = queryset.filter(
+                self.keyset_filter(ordering, self.position))
+        return queryset[:self.limit + 1]
+
+    def get_keyset_rows(self, rows):
+        """The page out of the rows read, with the links around it."""
+        limit, position, reverse = self.limit, self.position, self.reverse
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if reverse:
+            rows.reverse()
+        has_next = has_more if not reverse else position is not None
+        has_previous = has_more if reverse else position is not None
+        self.next_link = self.previous_link = None
+        if rows and has_next:
+            self.next_link = self.encode_cursor(rows[-1], reverse=False)
+        if rows and has_previous:
+            self.previous_link = self.encode_cursor(rows[0], reverse=True)
+        return rows
+
+    @staticmethod
+    def invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def keyset_filter(ordering, position):
+        """Rows strictly after position in ordering."""
+        keyset = Q()
+        equal = {}
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            keyset |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return keyset
+
+    @staticmethod
+    def get_model_field(model, name):
+        if name == 'pk':
+            return model._meta.pk
+        try:
+            return model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+
+    def encode_cursor(self, obj, reverse):
+        position = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            model_field = self.get_model_field(obj, name)
+            if model_field is not None:
+                position.append(model_field.value_to_string(obj))
+            else:
+                position.append(getattr(obj, name))
+        cursor = urlsafe_b64encode(json.dumps(
+            {'p': position, 'r': reverse}).encode()).decode()
+        url = remove_query_param(self.request.build_absolute_uri(),
+                                 self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode()))
+            if len(cursor['p']) != len(self.ordering):
+                raise ValueError
+            position = []
+            for field, value in zip(self.ordering, cursor['p']):
+                model_field = self.get_model_field(model, field.lstrip('-'))
+                if model_field is not None:
+                    value = model_field.to_python(value)
+                position.append(value)
+            return position, bool(cursor['r'])
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
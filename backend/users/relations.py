@@ -0,0 +1,61 @@
+class Relations:
+    """Relationships of the request user with the objects being rendered.
+
+    Subscribed author ids, favorite and cart recipe ids are loaded with one
+    query each for every batch of ids passed to prime(); objects that were
+    never primed are loaded on first lookup. Answers are then served from
+    in-memory sets for the rest of the request.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.subscribed = set()
+        self.favorites = set()
+        self.cart = set()
+        self.known_author_ids = set()
+        self.known_recipe_ids = set()
+
+    def prime(self, author_ids=(), recipe_ids=()):
+        if self.user.is_anonymous:
+            return
+        author_ids = set(author_ids) - self.known_author_ids
+        if author_ids:
+            self.subscribed.update(self.user.subscribe.filter(
+                id__in=author_ids).values_list('id', flat=True))
+            self.known_author_ids |= author_ids
+        recipe_ids = set(recipe_ids) - self.known_recipe_ids
+        if recipe_ids:
+            self.favorites.update(self.user.favorites.filter(
+                id__in=recipe_ids).values_list('id', flat=True))
+            self.cart.update(self.user.user_cart.filter(
+                id__in=recipe_ids).values_list('id', flat=True))
+            self.known_recipe_ids |= recipe_ids
+
+    def is_subscribed(self, author):
+        return self.is_subscribed_to(author.pk)
+
+    def is_subscribed_to(self, author_id):
+        if self.user.is_anonymous or author_id == self.user.pk:
+            return False
+        self.prime(author_ids=(author_id,))
+        return author_id in self.subscribed
+
+    def is_favorited(self, recipe):
+        if self.user.is_anonymous:
+            return False
+        self.prime(recipe_ids=(recipe.pk,))
+        return recipe.pk in self.favorites
+
+    def is_in_shopping_cart(self, recipe):
+        if self.user.is_anonymous:
+            return False
+        self.prime(recipe_ids=(recipe.pk,))
+        return recipe.pk in self.cart
+
+
+def get_relations(request):
+    """Relations of request.user, shared by all serializers of a request."""
+    relations = getattr(request, '_relations', None)
+    if relations is None or relations.user != request.user:
+        request._relations = Relations(request.user)
+    return request._relations
@@ -1,17 +1,34 @@
+from django.db import models
+from foodgram.profiling import TimedSerializerMixin
+from recipes.images import get_srcset
 from recipes.models import Recipe
 from rest_framework import serializers
 from users.models import User
+from users.relations import get_relations
 
 
-class ShortRecipeSerializer(serializers.ModelSerializer):
+class RelationsListSerializer(serializers.ListSerializer):
+    """Lets the child prime request relations for all items at once."""
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.Manager) else data)
+        self.child.prime_relations(items)
+        return super().to_representation(items)
+
+
+class ShortRecipeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for model Recipe and short view."""
+    srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = Recipe
-        fields = 'id', 'name', 'image', 'cooking_time'
+        fields = 'id', 'name', 'image', 'srcset', 'cooking_time'
         read_only_fields = '__all__',
 
+    def get_srcset(self, obj):
+        return get_srcset(obj, self.context.get('request'))
+
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for model User."""
     is_subscribed = serializers.SerializerMethodField(read_only=True)
 
@@ -27,12 +44,17 @@ class UserSerializer(serializers.ModelSerializer):
             'password',
         )
         extra_kwargs = {'password': {'write_only': True}}
+        list_serializer_class = RelationsListSerializer
+
+    def prime_relations(self, users):
+        if users and not hasattr(users[0], 'is_subscribed'):
+            get_relations(self.context.get('request')).prime(
+                author_ids=[user.pk for user in users])
 
     def get_is_subscribed(self, obj):
-        user = self.context.get('request').user
-        if user.is_anonymous or (user == obj):
-            return False
-        return user.subscribe.filter(id=obj.id).exists()
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return get_relations(self.context.get('request')).is_subscribed(obj)
 
 
 class PasswordSerializer(serializers.ModelSerializer):
@@ -60,7 +82,7 @@ class PasswordSerializer(serializers.ModelSerializer):
 
 class UserSubscribeSerializer(UserSerializer):
     """Serializer for user ."""
-    recipes = ShortRecipeSerializer(many=True, read_only=True)
+    recipes = serializers.SerializerMethodField()
     recipes_count = serializers.SerializerMethodField()
 
     class Meta:
@@ -76,15 +98,28 @@ class UserSubscribeSerializer(UserSerializer):
             'recipes_count',
         )
         read_only_fields = '__all__',
+        list_serializer_class = RelationsListSerializer
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        recipes = obj.recipes.all()
-        recipes_limit = request.query_params.get('recipes_limit')
-        if recipes_limit:
-            recipes = recipes[:int(recipes_limit)]
-        return ShortRecipeSerializer(recipes, many=True).data
+        if hasattr(obj, 'limited_recipes'):
+            recipes = obj.limited_recipes
+        else:
+            recipes = obj.recipes.all()
+            recipes_limit = get_recipes_limit(self.context.get('request'))
+            if recipes_limit:
+                recipes = recipes[:recipes_limit]
+        return ShortRecipeSerializer(
+            recipes, many=True, context=self.context).data
 
     @staticmethod
     def get_recipes_count(obj):
-        return obj.recipes.count()
+        return obj.recipes_count
+
+
+def get_recipes_limit(request):
+    """Positive recipes_limit query parameter or None."""
+    try:
+        recipes_limit = int(request.query_params['recipes_limit'])
+    except (KeyError, ValueError):
+        return None
+    return recipes_limit if recipes_limit > 0 else None
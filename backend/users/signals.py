@@ -0,0 +1,75 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
+from .counters import change_counters, count_pairs
+from .models import User
+
+Subscribe = User.subscribe.through
+
+
+def get_subscribe_pairs(instance, reverse, pk_set):
+    """Existing (from_user_id, to_user_id) rows of User.subscribe touched by
+    a change made through instance."""
+    if reverse:
+        filters = {'to_user_id': instance.pk}
+        if pk_set is not None:
+            filters['from_user_id__in'] = pk_set
+    else:
+        filters = {'from_user_id': instance.pk}
+        if pk_set is not None:
+            filters['to_user_id__in'] = pk_set
+    return list(Subscribe.objects.filter(**filters).values_list(
+        'from_user_id', 'to_user_id'))
+
+
+@receiver(m2m_changed, sender=Subscribe)
+def update_subscribers_count(instance, action, reverse, pk_set, **kwargs):
+    if action in ('pre_remove', 'pre_clear'):
+        instance._removed_subscribe_pairs = get_subscribe_pairs(
+            instance, reverse, pk_set)
+    elif action in ('post_remove', 'post_clear'):
+        pairs = instance.__dict__.pop('_removed_subscribe_pairs')
+        change_counters(User, 'subscribers_count',
+                        count_pairs(pairs, 1, sign=-1))
+    elif action == 'post_add':
+        if reverse:
+            deltas = {instance.pk: len(pk_set)}
+        else:
+            deltas = dict.fromkeys(pk_set, 1)
+        change_counters(User, 'subscribers_count', deltas)
+
+
+@receiver(pre_delete, sender=User)
+def update_counters_of_deleted_user(instance, **kwargs):
+    pairs = get_subscribe_pairs(instance, False, None)
+    change_counters(User, 'subscribers_count',
+                    count_pairs(pairs, 1, sign=-1))
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(instance, **kwargs):
+    transaction.on_commit(partial(token_cache.forget, [instance.key]))
+
+
+# Saved fields that change whether the tokens of a user authenticate.
+AUTHENTICATION_FIELDS = {'password', 'is_active'}
+
+
+# Password changes and deactivation save the user: drop the cached copies,
+# whose is_active may be stale, so that the change applies at once. Saves
+# limited to other fields, like last_login on each login, are skipped.
+@receiver(post_save, sender=User)
+def forget_user_tokens(instance, created, update_fields, **kwargs):
+    if created or (update_fields is not None
+                   and not AUTHENTICATION_FIELDS & set(update_fields)):
+        return
+    keys = list(Token.objects.filter(user=instance).values_list(
+        'key', flat=True))
+    if keys:
+        transaction.on_commit(partial(token_cache.forget, keys))
@@ -1,19 +1,24 @@
+from django.db.models import BooleanField, OuterRef, Prefetch, Subquery, Value
 from django.shortcuts import get_object_or_404
+from foodgram.asyncviews import AsyncReadMixin, aserialize
+from recipes.models import Recipe
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from users.models import User
 from users.paginators import PageLimitPagination
 from users.serializers import (PasswordSerializer, UserSerializer,
-                               UserSubscribeSerializer)
+                               UserSubscribeSerializer, get_recipes_limit)
 
 
-class UserViewSet(viewsets.ModelViewSet):
-    """ViewSet for model User."""
+class UserViewSet(AsyncReadMixin, viewsets.ModelViewSet):
+    """ViewSet for model User. Subscriptions have an async read path."""
+    async_actions = ('subscriptions',)
     queryset = User.objects.all()
     serializer_class = UserSerializer
     http_method_names = ['get', 'post', 'delete']
     pagination_class = PageLimitPagination
+    keyset_ordering = ('-date_joined', '-id')
 
     def get_object(self):
         if self.kwargs.get('pk') == 'me':
@@ -50,14 +55,37 @@ class UserViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'],
             permission_classes=[permissions.IsAuthenticated])
     def subscriptions(self, request):
-        user = self.request.user
-        authors = user.subscribe.all()
-        pages = self.paginate_queryset(authors)
+        pages = self.paginate_queryset(self.get_subscriptions(request))
         serializer = UserSubscribeSerializer(
             pages, many=True, context={'request': request}
         )
         return self.get_paginated_response(serializer.data)
 
+    async def asubscriptions(self, request):
+        pages = await self.apaginate_queryset(
+            self.get_subscriptions(request))
+        serializer = UserSubscribeSerializer(
+            pages, many=True, context={'request': request}
+        )
+        return self.get_paginated_response(await aserialize(serializer))
+
+    @staticmethod
+    def get_subscriptions(request):
+        """Authors followed by the user with their latest recipes."""
+        recipes = Recipe.objects.all()
+        recipes_limit = get_recipes_limit(request)
+        if recipes_limit:
+            recipes = recipes.filter(pk__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).order_by('-created', '-id').values('pk')[:recipes_limit]
+            ))
+        return request.user.subscribe.annotate(
+            is_subscribed=Value(True, output_field=BooleanField())
+        ).prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='limited_recipes')
+        )
+
     @action(detail=True, methods=['post', 'delete'],
             permission_classes=[permissions.IsAuthenticated],
             serializer_class=UserSubscribeSerializer)
@@ -71,7 +99,7 @@ class UserViewSet(viewsets.ModelViewSet):
                     {'errors': 'Невозможно подписаться на самого себя.'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            if User.objects.filter(subscribe=author_id).exists():
+            if user.subscribe.filter(id=author_id).exists():
                 return Response(
                     {'errors': 'Вы уже подписаны на этого автора.'},
                     status=status.HTTP_400_BAD_REQUEST
@@ -81,7 +109,7 @@ class UserViewSet(viewsets.ModelViewSet):
                 'request': request})
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         elif request.method == 'DELETE':
-            if User.objects.filter(subscribe=author_id).exists():
+            if user.subscribe.filter(id=author_id).exists():
                 user.subscribe.remove(author)
                 return Response(status=status.HTTP_204_NO_CONTENT)
             return Response({'errors': 'Вы не подписаны на этого автора.'},